@@ -1,17 +1,36 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, redirect
 from flask_cors import CORS
 import os
 import json
+import copy
 import logging
 from dotenv import load_dotenv
 import requests
-from io import BytesIO
 import re
-from urllib.parse import quote, urljoin
-import speech_recognition as sr
+import unicodedata
+from urllib.parse import quote
 import tempfile
-import wave
+import queue
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from cache import TTLCache, make_fingerprint
+from stream_parser import IncrementalItineraryParser
+from provider_router import ProviderRouter
+from single_flight import SingleFlight
+from audio_store import AudioStore
+from narration import NarrationStore
+from presynth import NarrationPrefetcher
+import mp3
+from upstream import UpstreamClient
+from providers import ProviderRegistry, module_available
+from weather_cache import WeatherCache, weather_location_key
+from gazetteer import Gazetteer, place_from_city
+from tickets import search_ticket_info
+from attractions import AttractionCatalog
+from event_store import EventStore
+from llm_output import (ITINERARY_FORMAT, DAY_FORMAT, OUTLINE_FORMAT, output_stats,
+                        parse_structured, gemini_schema, openai_response_format)
 
 # Load environment variables
 load_dotenv()
@@ -23,6 +42,9 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
+# Let a front proxy (nginx X-Accel / Apache X-Sendfile) serve audio file bodies
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+
 # Configure API keys
 CEREBRAS_API_KEY = os.getenv('CEREBRAS_API_KEY')
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
@@ -31,53 +53,309 @@ ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
 
-# Check which AI service to use (priority order: Gemini -> Cerebras -> OpenRouter)
-cerebras_client = None
-gemini_client = None
-AI_SERVICE = None
-
-# Try Gemini first (primary option)
+# Models used by each AI provider
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+CEREBRAS_MODEL = "llama3.1-8b"  # Available Cerebras model
+OPENROUTER_MODEL = "meta-llama/llama-3.2-3b-instruct:free"  # Free model
+AI_MODELS = {
+    'gemini': GEMINI_MODEL,
+    'cerebras': CEREBRAS_MODEL,
+    'openrouter': OPENROUTER_MODEL
+}
+
+# ElevenLabs narration settings
+ELEVENLABS_VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"  # George voice (clear, professional)
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"  # Supports multiple languages
+ELEVENLABS_OUTPUT_FORMAT = "mp3_44100_128"
+SAMPLE_AUDIO_URL = 'https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3'
+
+# Pooled HTTP clients (keep-alive, connect/read timeouts, retries, circuit breaker) per upstream
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '2'))
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', '5'))
+UPSTREAM_BREAKER_RESET = int(os.getenv('UPSTREAM_BREAKER_RESET', '30'))
+# Keep-alive connections per upstream. Must cover the request threads of a worker
+# (GUNICORN_THREADS, 32) plus the place geocoding pool (PLACE_GEOCODE_WORKERS, 16):
+# urllib3 closes connections returned to a full pool, so a smaller pool reconnects
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '64'))
+
+
+def make_upstream(name, base_url, read_timeout):
+    return UpstreamClient(
+        name, base_url,
+        connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+        read_timeout=read_timeout,
+        retries=UPSTREAM_RETRIES,
+        failure_threshold=UPSTREAM_BREAKER_THRESHOLD,
+        reset_timeout=UPSTREAM_BREAKER_RESET,
+        pool_size=UPSTREAM_POOL_SIZE
+    )
+
+
+google_maps_http = make_upstream(
+    'google_maps', 'https://maps.googleapis.com', float(os.getenv('GOOGLE_MAPS_READ_TIMEOUT', '10')))
+openweather_http = make_upstream(
+    'openweather', 'https://api.openweathermap.org', float(os.getenv('OPENWEATHER_READ_TIMEOUT', '10')))
+# LLM completions are slow; for streams the read timeout is the longest gap between chunks
+openrouter_http = make_upstream(
+    'openrouter', 'https://openrouter.ai', float(os.getenv('OPENROUTER_READ_TIMEOUT', '60')))
+UPSTREAMS = [google_maps_http, openweather_http, openrouter_http]
+
+# Provider SDK clients and heavy optional modules are created on first use (providers.py),
+# so startup and /api/health never import them
+providers = ProviderRegistry()
+
+
+def create_gemini_client():
+    from google import genai
+    return genai.Client(api_key=GEMINI_API_KEY)
+
+
+def create_cerebras_client():
+    from cerebras.cloud.sdk import Cerebras
+    return Cerebras(api_key=CEREBRAS_API_KEY)
+
+
+def create_elevenlabs_client():
+    from elevenlabs.client import ElevenLabs
+    return ElevenLabs(api_key=ELEVENLABS_API_KEY)
+
+
+providers.register('gemini', create_gemini_client, configured=bool(GEMINI_API_KEY))
+providers.register('cerebras', create_cerebras_client, configured=bool(CEREBRAS_API_KEY))
+providers.register('elevenlabs', create_elevenlabs_client, configured=bool(ELEVENLABS_API_KEY))
+
+# Every configured AI service with an installed SDK (priority order: Gemini -> Cerebras -> OpenRouter).
+# AI_SERVICE is the preferred one; requests are routed across all of them by ai_router.
+AI_PROVIDERS = []
+
+# Gemini (primary option)
 if GEMINI_API_KEY:
-    try:
-        from google import genai
-        gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-        AI_SERVICE = 'gemini'
-        logger.info("✅ Using Gemini API (Primary)")
-    except ImportError as e:
-        logger.warning(f"Gemini SDK not installed: {e}, falling back to next option")
+    if module_available('google.genai'):
+        AI_PROVIDERS.append('gemini')
+        logger.info("✅ Gemini API configured (Primary)")
+    else:
+        logger.warning("Gemini SDK not installed, falling back to next option")
         logger.info("   Install with: pip install google-genai")
-        AI_SERVICE = None
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini client: {e}")
-        AI_SERVICE = None
 
-# Try Cerebras as backup
-if not AI_SERVICE and CEREBRAS_API_KEY:
-    try:
-        from cerebras.cloud.sdk import Cerebras
-        cerebras_client = Cerebras(api_key=CEREBRAS_API_KEY)
-        AI_SERVICE = 'cerebras'
-        logger.info("✅ Using Cerebras API (Backup)")
-    except ImportError as e:
-        logger.warning(f"Cerebras SDK not installed: {e}, falling back to next option")
-        AI_SERVICE = None
-    except Exception as e:
-        logger.error(f"Failed to initialize Cerebras client: {e}")
-        AI_SERVICE = None
-
-# Try OpenRouter as last resort
-if not AI_SERVICE and OPENROUTER_API_KEY:
-    AI_SERVICE = 'openrouter'
-    logger.info("✅ Using OpenRouter API (Fallback)")
-
-if not AI_SERVICE:
+# Cerebras (backup)
+if CEREBRAS_API_KEY:
+    if module_available('cerebras.cloud.sdk'):
+        AI_PROVIDERS.append('cerebras')
+        logger.info("✅ Cerebras API configured (Backup)")
+    else:
+        logger.warning("Cerebras SDK not installed, falling back to next option")
+
+# OpenRouter (last resort)
+if OPENROUTER_API_KEY:
+    AI_PROVIDERS.append('openrouter')
+    logger.info("✅ OpenRouter API configured (Fallback)")
+
+AI_SERVICE = AI_PROVIDERS[0] if AI_PROVIDERS else None
+if AI_SERVICE:
+    logger.info(f"✅ Using {AI_SERVICE} as preferred AI service")
+else:
     logger.warning("⚠️  No AI API configured, will use sample data")
-    AI_SERVICE = None
+
+# Hedged requests: fire a backup provider after AI_HEDGE_DELAY seconds
+# (unset = the preferred provider's recent p95 latency)
+AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'true').lower() == 'true'
+AI_HEDGE_DELAY = float(os.getenv('AI_HEDGE_DELAY')) if os.getenv('AI_HEDGE_DELAY') else None
+# Threads available for concurrent AI calls (each in-flight generation, plus its hedge, uses one)
+AI_ROUTER_WORKERS = int(os.getenv('AI_ROUTER_WORKERS', '256'))
 
 # Create temp folder
 AUDIO_FOLDER = 'temp_audio'
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 
+# Audio files are kept under a byte quota (least recently played are evicted first)
+# and expire after AUDIO_MAX_AGE seconds without being played
+audio_store = AudioStore(
+    AUDIO_FOLDER,
+    max_bytes=int(os.getenv('AUDIO_MAX_BYTES', str(500 * 1024 * 1024))),
+    max_age=int(os.getenv('AUDIO_MAX_AGE', str(30 * 24 * 3600)))
+)
+# The janitor thread is started per worker (init_worker, ASGI startup) or by the dev server,
+# never at import: a preloading master would sweep alongside every worker
+AUDIO_JANITOR_INTERVAL = int(os.getenv('AUDIO_JANITOR_INTERVAL', '300'))
+
+# Browser cache lifetime for content-hashed audio files (1 year)
+AUDIO_CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Parallel per-day generation (used when days >= ITINERARY_PARALLEL_MIN_DAYS, 0 = only on request)
+ITINERARY_PARALLEL_MIN_DAYS = int(os.getenv('ITINERARY_PARALLEL_MIN_DAYS', '0'))
+ITINERARY_DAY_WORKERS = int(os.getenv('ITINERARY_DAY_WORKERS', '4'))
+ITINERARY_DAY_RETRIES = int(os.getenv('ITINERARY_DAY_RETRIES', '1'))
+
+# Itinerary cache (set ITINERARY_CACHE_DB to keep entries across restarts; the
+# weather and playlist caches have their own WEATHER_CACHE_DB / PLAYLIST_CACHE_DB)
+itinerary_cache = TTLCache(
+    'itinerary',
+    max_entries=int(os.getenv('ITINERARY_CACHE_SIZE', '256')),
+    ttl=int(os.getenv('ITINERARY_CACHE_TTL', str(24 * 3600))),
+    db_path=os.getenv('ITINERARY_CACHE_DB') or None
+)
+
+class GeocodingError(Exception):
+    """Raised when the Geocoding API returns a non-OK status"""
+
+
+# Single-flight groups: identical in-flight upstream calls are made once.
+# Set SINGLE_FLIGHT_DB to coalesce across worker processes as well; errors
+# the routes handle specifically are re-raised in followers with their type.
+SINGLE_FLIGHT_DB = os.getenv('SINGLE_FLIGHT_DB') or None
+itinerary_flight = SingleFlight('itinerary', db_path=SINGLE_FLIGHT_DB, error_types=(json.JSONDecodeError,))
+audio_flight = SingleFlight('audio', db_path=SINGLE_FLIGHT_DB)
+geocode_flight = SingleFlight('geocode', db_path=SINGLE_FLIGHT_DB,
+                              error_types=(GeocodingError, requests.exceptions.RequestException))
+weather_flight = SingleFlight('weather', db_path=SINGLE_FLIGHT_DB,
+                              error_types=(requests.exceptions.RequestException,))
+
+# Narrations are synthesized sentence by sentence (each sentence cached on its own)
+# with at most ELEVENLABS_MAX_CONCURRENCY requests to ElevenLabs at a time
+narration_store = NarrationStore(
+    audio_store, ELEVENLABS_API_KEY,
+    ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, ELEVENLABS_OUTPUT_FORMAT,
+    max_concurrency=int(os.getenv('ELEVENLABS_MAX_CONCURRENCY', '3')),
+    split_sentences=os.getenv('NARRATION_SPLIT_SENTENCES', 'true').lower() == 'true',
+    client_factory=lambda: providers.get('elevenlabs'),
+    clip_flight=SingleFlight('audio_clip', db_path=SINGLE_FLIGHT_DB)
+)
+
+# Geocoding results are kept in SQLite (GEOCODE_CACHE_DB, empty = memory only):
+# normalized query -> place_ids, and a place_id index of parsed place_info records
+GEOCODE_CACHE_DB = os.getenv('GEOCODE_CACHE_DB', os.path.join('cache', 'geocode.sqlite3')) or None
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = int(os.getenv('GEOCODE_NEGATIVE_TTL', str(24 * 3600)))
+geocode_cache = TTLCache(
+    'geocode',
+    max_entries=int(os.getenv('GEOCODE_CACHE_SIZE', '4096')),
+    ttl=GEOCODE_CACHE_TTL,
+    db_path=GEOCODE_CACHE_DB
+)
+place_index = TTLCache(
+    'place',
+    max_entries=int(os.getenv('PLACE_INDEX_SIZE', '8192')),
+    ttl=GEOCODE_CACHE_TTL,
+    db_path=GEOCODE_CACHE_DB
+)
+
+# Itinerary attractions are geocoded on the server, concurrently, and cached
+# per (place name, city) in the geocode database
+PLACE_GEOCODE_WORKERS = int(os.getenv('PLACE_GEOCODE_WORKERS', '16'))
+PLACE_GEOCODE_TIMEOUT = float(os.getenv('PLACE_GEOCODE_TIMEOUT', '10'))
+# Half-size (degrees) of the box around the confirmed place that biases results
+PLACE_GEOCODE_BIAS_DEGREES = float(os.getenv('PLACE_GEOCODE_BIAS_DEGREES', '0.5'))
+place_geocode_executor = ThreadPoolExecutor(
+    max_workers=PLACE_GEOCODE_WORKERS, thread_name_prefix='place-geocode')
+place_geocode_cache = TTLCache(
+    'place_geocode',
+    max_entries=int(os.getenv('PLACE_GEOCODE_CACHE_SIZE', '8192')),
+    ttl=GEOCODE_CACHE_TTL,
+    db_path=GEOCODE_CACHE_DB
+)
+
+# Local attraction catalog for ticket info (ATTRACTION_CATALOG_PATH, empty = disabled);
+# built into an SQLite file that all workers read memory-mapped
+ATTRACTION_CATALOG_PATH = os.getenv('ATTRACTION_CATALOG_PATH', os.path.join('data', 'attractions.csv'))
+ATTRACTION_DB = os.getenv('ATTRACTION_DB', os.path.join('cache', 'attractions.sqlite3'))
+attraction_catalog = None
+if ATTRACTION_CATALOG_PATH:
+    if os.path.exists(ATTRACTION_CATALOG_PATH):
+        attraction_catalog = AttractionCatalog.open(
+            ATTRACTION_CATALOG_PATH, ATTRACTION_DB,
+            min_score=float(os.getenv('ATTRACTION_MIN_SCORE', '0.6')))
+    else:
+        logger.warning(f"⚠️  Attraction catalog not found: {ATTRACTION_CATALOG_PATH}, using keyword rules only")
+
+# Holidays, festivals and city events, indexed by scope and date once per year
+EVENTS_PATH = os.getenv('EVENTS_PATH', os.path.join('data', 'events.json'))
+event_store = EventStore.from_json(EVENTS_PATH)
+# Longest range (in days) an events query may cover
+EVENTS_MAX_DAYS = int(os.getenv('EVENTS_MAX_DAYS', '30'))
+
+# Offline city gazetteer (GAZETTEER_PATH, empty = disabled): city searches and
+# autocomplete are answered locally, Google is only called on a miss
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join('data', 'cities.csv'))
+GAZETTEER_RESULTS = int(os.getenv('GAZETTEER_RESULTS', '5'))
+# A search with fewer gazetteer matches than this also asks Google, so towns
+# missing from the file (or a namesake elsewhere) still show up
+GAZETTEER_MIN_RESULTS = int(os.getenv('GAZETTEER_MIN_RESULTS', '2'))
+gazetteer = None
+if GAZETTEER_PATH:
+    if os.path.exists(GAZETTEER_PATH):
+        gazetteer = Gazetteer.from_csv(GAZETTEER_PATH)
+    else:
+        logger.warning(f"⚠️  Gazetteer file not found: {GAZETTEER_PATH}, all searches go to Google")
+
+# OpenWeather responses are cached per location (lat/lon snapped to a WEATHER_GRID_DEGREES
+# grid, or the city name) and per WEATHER_BUCKET_SECONDS time bucket, then served stale for
+# up to WEATHER_STALE_SECONDS while a background refresh runs. Current conditions are
+# derived from the cached forecast so one upstream call feeds both weather routes.
+WEATHER_GRID_DEGREES = float(os.getenv('WEATHER_GRID_DEGREES', '0.1'))
+WEATHER_CURRENT_FROM_FORECAST = os.getenv('WEATHER_CURRENT_FROM_FORECAST', 'true').lower() == 'true'
+weather_cache = WeatherCache(
+    'weather',
+    bucket_seconds=int(os.getenv('WEATHER_BUCKET_SECONDS', '1800')),
+    stale_seconds=int(os.getenv('WEATHER_STALE_SECONDS', str(6 * 3600))),
+    max_entries=int(os.getenv('WEATHER_CACHE_SIZE', '1024')),
+    db_path=os.getenv('WEATHER_CACHE_DB') or None
+)
+
+
+def synthesize_cached_narration(text):
+    """Synthesize text into the narration cache, sharing in-flight calls"""
+    return audio_flight.do(narration_store.key(text), lambda: narration_store.synthesize(text))
+
+
+# Background narration pre-synthesis for new itineraries (opt-in per request).
+# Keep NARRATION_PRESYNTH_WORKERS within the ElevenLabs concurrency limit.
+NARRATION_PRESYNTH_WORKERS = int(os.getenv('NARRATION_PRESYNTH_WORKERS', '2'))
+NARRATION_PRESYNTH_MAX = int(os.getenv('NARRATION_PRESYNTH_MAX', '10'))
+narration_prefetcher = NarrationPrefetcher(
+    synthesize_cached_narration,
+    lambda text: narration_store.lookup(text) is not None,
+    workers=NARRATION_PRESYNTH_WORKERS
+)
+
+# Whole-day narration playlists: the places of a day, stored under a content id so
+# the manifest and the joined MP3 stream can be fetched with plain GETs
+playlist_cache = TTLCache(
+    'playlist',
+    max_entries=int(os.getenv('PLAYLIST_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('PLAYLIST_CACHE_TTL', str(24 * 3600))),
+    db_path=os.getenv('PLAYLIST_CACHE_DB') or None
+)
+# Missing clips of a streamed day are synthesized this many places ahead of playback
+PLAYLIST_LOOKAHEAD = int(os.getenv('PLAYLIST_LOOKAHEAD', '2'))
+playlist_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PLAYLIST_WORKERS', '4')), thread_name_prefix='playlist')
+# Trip context: weather, forecast, events and the itinerary are fetched concurrently
+trip_context_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('TRIP_CONTEXT_WORKERS', '128')), thread_name_prefix='trip-context')
+# Streamed itineraries are generated here (through itinerary_flight) while the request relays the events
+itinerary_stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ITINERARY_STREAM_WORKERS', '64')), thread_name_prefix='itinerary-stream')
+# Bit rate of ELEVENLABS_OUTPUT_FORMAT, used to estimate clip durations from file sizes
+NARRATION_BITRATE = 128000
+
+
+def init_worker():
+    """
+    Per-process setup for a worker forked from a preloaded app (gunicorn post_fork):
+    fresh HTTP connection pools and provider clients, and the audio janitor thread.
+    """
+    for client in UPSTREAMS:
+        client.reset()
+    providers.reset()
+    for name in ('gemini', 'cerebras', 'elevenlabs'):
+        if providers.configured(name):
+            try:
+                providers.get(name)
+            except Exception as e:
+                logger.warning(f"Could not initialize {name}: {e}")
+    audio_store.start_janitor(interval=AUDIO_JANITOR_INTERVAL)
+
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -90,14 +368,149 @@ def health_check():
         'gemini_configured': bool(GEMINI_API_KEY),
         'elevenlabs_configured': bool(ELEVENLABS_API_KEY),
         'maps_configured': bool(GOOGLE_MAPS_API_KEY),
-        'weather_configured': bool(OPENWEATHER_API_KEY)
+        'weather_configured': bool(OPENWEATHER_API_KEY),
+        'ai_providers': ai_router.to_dict(),
+        'llm_output': output_stats.to_dict(),
+        'itinerary_cache': itinerary_cache.stats(),
+        'geocode_cache': geocode_cache.stats(),
+        'place_index': place_index.stats(),
+        'place_geocode_cache': place_geocode_cache.stats(),
+        'gazetteer': {'cities': len(gazetteer)} if gazetteer else None,
+        'attraction_catalog': attraction_catalog.stats() if attraction_catalog else None,
+        'narration_prefetch': narration_prefetcher.stats(),
+        'audio_store': audio_store.stats(),
+        'providers': providers.status(),
+        'single_flight': {
+            'itinerary': itinerary_flight.stats(),
+            'audio': audio_flight.stats(),
+            'audio_clip': narration_store.clip_flight.stats(),
+            'geocode': geocode_flight.stats(),
+            'weather': weather_flight.stats()
+        },
+        'weather_cache': weather_cache.stats(),
+        'upstreams': {client.name: client.stats() for client in UPSTREAMS}
     })
 
 
+def geocode_places(query, place_id=None, bounds=None):
+    """
+    Query the Google Geocoding API and parse each result into a place_info
+    dict (formatted address, place_id, location, city, state, country).
+    With place_id, the place is looked up by its ID instead of an address;
+    bounds ("south,west|north,east") biases results towards that area.
+    """
+    # Use Google Geocoding API to search for the place
+    params = {'key': GOOGLE_MAPS_API_KEY}
+    if place_id:
+        params['place_id'] = place_id
+    else:
+        params['address'] = query
+    if bounds:
+        params['bounds'] = bounds
+
+    logger.info(f"🔍 Searching for place: {query or place_id}")
+    response = google_maps_http.get('/maps/api/geocode/json', params=params)
+    response.raise_for_status()
+
+    geocode_data = response.json()
+
+    if geocode_data['status'] == 'ZERO_RESULTS':
+        return []
+
+    if geocode_data['status'] != 'OK':
+        raise GeocodingError(geocode_data['status'])
+
+    # Parse results to extract relevant place information
+    places = []
+    for result in geocode_data['results']:
+        place_info = {
+            'formatted_address': result['formatted_address'],
+            'place_id': result['place_id'],
+            'location': result['geometry']['location'],
+            'city': None,
+            'state': None,
+            'country': None,
+            'country_code': None
+        }
+
+        # Extract city, state, and country from address components
+        for component in result['address_components']:
+            types = component['types']
+
+            if 'locality' in types:
+                place_info['city'] = component['long_name']
+            elif 'administrative_area_level_1' in types:
+                place_info['state'] = component['long_name']
+            elif 'country' in types:
+                place_info['country'] = component['long_name']
+                place_info['country_code'] = component['short_name']
+
+        # If no city found, try to use other locality types
+        if not place_info['city']:
+            for component in result['address_components']:
+                types = component['types']
+                if 'administrative_area_level_2' in types or 'sublocality' in types:
+                    place_info['city'] = component['long_name']
+                    break
+
+        places.append(place_info)
+
+    return places
+
+
+def normalize_place_query(query):
+    """Cache key for a search: case, Unicode form and whitespace do not matter"""
+    query = unicodedata.normalize('NFKC', query).casefold()
+    query = re.sub(r'\s*,\s*', ', ', query)
+    return ' '.join(query.split()).strip(', ')
+
+
+def index_places(places):
+    """Store parsed place_info records under their place_id"""
+    for place in places:
+        place_index.set(place['place_id'], place)
+
+
+def search_gazetteer(query):
+    """place_info dicts for the gazetteer cities matching query (largest first)"""
+    if gazetteer is None:
+        return []
+    return [place_from_city(city) for city in gazetteer.search(query, GAZETTEER_RESULTS)]
+
+
+def same_place(a, b):
+    """Whether two place_info dicts are the same city (same country, within ~10 km)"""
+    return (a.get('country_code') == b.get('country_code')
+            and abs(a['location']['lat'] - b['location']['lat']) < 0.1
+            and abs(a['location']['lng'] - b['location']['lng']) < 0.1)
+
+
+def search_places_cached(query):
+    """
+    Return (places, cache_status) for a search query. Hits are served from
+    the query cache and place_id index without calling Google or re-parsing.
+    """
+    key = normalize_place_query(query)
+    place_ids = geocode_cache.get(key)
+    if place_ids is not None:
+        places = [place_index.get(place_id) for place_id in place_ids]
+        if all(place is not None for place in places):
+            return places, 'hit'
+
+    # Identical concurrent searches share one upstream call
+    places = geocode_flight.do(key, lambda: geocode_places(query))
+    index_places(places)
+    geocode_cache.set(key, [place['place_id'] for place in places],
+                      ttl=None if places else GEOCODE_NEGATIVE_TTL)
+    return places, 'miss'
+
+
 @app.route('/api/search-places', methods=['POST'])
 def search_places():
     """
-    Search for places using Google Geocoding API.
+    Search for places: city names are answered by the offline gazetteer;
+    when it has fewer than GAZETTEER_MIN_RESULTS matches the Google Geocoding
+    API is asked as well and its places not already listed are appended.
     Returns a list of matching places with their details (country, state, formatted address).
     Handles duplicate city names by returning all matches.
     """
@@ -107,70 +520,37 @@ def search_places():
     if not query:
         return jsonify({'error': 'Query parameter is required'}), 400
     
+    local_places = search_gazetteer(query)
+    if len(local_places) >= GAZETTEER_MIN_RESULTS or (local_places and not GOOGLE_MAPS_API_KEY):
+        logger.info(f"✅ Found {len(local_places)} place(s) (gazetteer)")
+        return jsonify({'places': local_places, 'cache': 'gazetteer'}), 200
+
     if not GOOGLE_MAPS_API_KEY:
         logger.warning("Google Maps API key not configured")
         return jsonify({'error': 'Google Maps API not configured'}), 500
     
     try:
-        # Use Google Geocoding API to search for the place
-        geocode_url = 'https://maps.googleapis.com/maps/api/geocode/json'
-        params = {
-            'address': query,
-            'key': GOOGLE_MAPS_API_KEY
-        }
-        
-        logger.info(f"🔍 Searching for place: {query}")
-        response = requests.get(geocode_url, params=params)
-        response.raise_for_status()
-        
-        geocode_data = response.json()
-        
-        if geocode_data['status'] == 'ZERO_RESULTS':
-            return jsonify({'places': []}), 200
-        
-        if geocode_data['status'] != 'OK':
-            logger.error(f"Geocoding API error: {geocode_data['status']}")
-            return jsonify({'error': f"Geocoding failed: {geocode_data['status']}"}), 500
-        
-        # Parse results to extract relevant place information
-        places = []
-        for result in geocode_data['results']:
-            place_info = {
-                'formatted_address': result['formatted_address'],
-                'place_id': result['place_id'],
-                'location': result['geometry']['location'],
-                'city': None,
-                'state': None,
-                'country': None,
-                'country_code': None
-            }
-            
-            # Extract city, state, and country from address components
-            for component in result['address_components']:
-                types = component['types']
-                
-                if 'locality' in types:
-                    place_info['city'] = component['long_name']
-                elif 'administrative_area_level_1' in types:
-                    place_info['state'] = component['long_name']
-                elif 'country' in types:
-                    place_info['country'] = component['long_name']
-                    place_info['country_code'] = component['short_name']
-            
-            # If no city found, try to use other locality types
-            if not place_info['city']:
-                for component in result['address_components']:
-                    types = component['types']
-                    if 'administrative_area_level_2' in types or 'sublocality' in types:
-                        place_info['city'] = component['long_name']
-                        break
-            
-            places.append(place_info)
-        
-        logger.info(f"✅ Found {len(places)} place(s)")
-        return jsonify({'places': places}), 200
-        
+        places, cache_status = search_places_cached(query)
+        if local_places:
+            places = local_places + [
+                place for place in places
+                if not any(same_place(place, local) for local in local_places)
+            ]
+            cache_status = f'gazetteer+{cache_status}'
+
+        logger.info(f"✅ Found {len(places)} place(s) (cache {cache_status})")
+        return jsonify({'places': places, 'cache': cache_status}), 200
+
+    except GeocodingError as e:
+        if local_places:
+            logger.warning(f"⚠️  Geocoding API error, serving gazetteer matches only: {str(e)}")
+            return jsonify({'places': local_places, 'cache': 'gazetteer'}), 200
+        logger.error(f"Geocoding API error: {str(e)}")
+        return jsonify({'error': f"Geocoding failed: {str(e)}"}), 500
     except requests.exceptions.RequestException as e:
+        if local_places:
+            logger.warning(f"⚠️  Geocoding API unreachable, serving gazetteer matches only: {str(e)}")
+            return jsonify({'places': local_places, 'cache': 'gazetteer'}), 200
         logger.error(f"❌ Error calling Geocoding API: {str(e)}")
         return jsonify({'error': 'Failed to search for places'}), 500
     except Exception as e:
@@ -178,10 +558,73 @@ def search_places():
         return jsonify({'error': 'Internal server error'}), 500
 
 
-def call_cerebras_api(prompt):
-    """Call Cerebras API"""
-    if not cerebras_client:
-        raise Exception("Cerebras client not initialized")
+@app.route('/api/places/<place_id>', methods=['GET'])
+def get_place(place_id):
+    """
+    Return the place_info for a place_id. Places already resolved by a search
+    are served from the place_id index; others are looked up by ID once.
+    """
+    city = gazetteer.get(place_id) if gazetteer else None
+    if city is not None:
+        return jsonify({'place': place_from_city(city), 'cache': 'gazetteer'}), 200
+
+    place = place_index.get(place_id)
+    if place is not None:
+        return jsonify({'place': place, 'cache': 'hit'}), 200
+
+    if not GOOGLE_MAPS_API_KEY:
+        return jsonify({'error': 'Place not found'}), 404
+
+    try:
+        places = geocode_flight.do(f'place_id:{place_id}', lambda: geocode_places(None, place_id=place_id))
+        index_places(places)
+        if not places:
+            return jsonify({'error': 'Place not found'}), 404
+        return jsonify({'place': places[0], 'cache': 'miss'}), 200
+    except GeocodingError as e:
+        logger.error(f"Geocoding API error: {str(e)}")
+        return jsonify({'error': f"Geocoding failed: {str(e)}"}), 404 if str(e) == 'INVALID_REQUEST' else 500
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ Error calling Geocoding API: {str(e)}")
+        return jsonify({'error': 'Failed to look up place'}), 500
+
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete_places():
+    """
+    City suggestions for a partially typed name (?q=par&limit=8), ranked by
+    population. Served from the offline gazetteer only, so it is cheap enough
+    to call on every keystroke; the final search still falls back to Google.
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    if not query or gazetteer is None:
+        return jsonify({'suggestions': []}), 200
+
+    cities = gazetteer.autocomplete(query, limit)
+    return jsonify({'suggestions': [place_from_city(city) for city in cities]}), 200
+
+
+def json_output_options(output_format):
+    """Extra chat-completions arguments asking for JSON matching output_format"""
+    if output_format is None:
+        return {}
+    return {'response_format': openai_response_format(output_format)}
+
+
+def gemini_config(output_format):
+    """Gemini generation config asking for JSON matching output_format"""
+    if output_format is None:
+        return None
+    return {
+        'response_mime_type': 'application/json',
+        'response_schema': gemini_schema(output_format.schema)
+    }
+
+
+def call_cerebras_api(prompt, output_format=None):
+    """Call Cerebras API (structured JSON output when output_format is given)"""
+    cerebras_client = providers.get('cerebras')
 
     try:
         logger.info("📡 Calling Cerebras API...")
@@ -196,10 +639,11 @@ def call_cerebras_api(prompt):
                     "content": prompt
                 }
             ],
-            model="llama3.1-8b",  # Available Cerebras model
+            model=CEREBRAS_MODEL,
             temperature=0.7,
             top_p=0.8,
-            max_completion_tokens=4000
+            max_completion_tokens=4000,
+            **json_output_options(output_format)
         )
         response_content = completion.choices[0].message.content
         logger.info(
@@ -210,16 +654,16 @@ def call_cerebras_api(prompt):
         raise
 
 
-def call_gemini_api(prompt):
-    """Call Gemini API using new google-genai SDK"""
-    if not gemini_client:
-        raise Exception("Gemini client not initialized")
+def call_gemini_api(prompt, output_format=None):
+    """Call Gemini API using new google-genai SDK (JSON mode when output_format is given)"""
+    gemini_client = providers.get('gemini')
 
     try:
         logger.info("📡 Calling Gemini API...")
         response = gemini_client.models.generate_content(
-            model="gemini-2.0-flash-exp",
+            model=GEMINI_MODEL,
             contents=prompt,
+            config=gemini_config(output_format),
         )
         response_content = response.text
         logger.info(f"✅ Gemini API response received ({len(response_content)} chars)")
@@ -229,9 +673,8 @@ def call_gemini_api(prompt):
         raise
 
 
-def call_openrouter_api(prompt):
-    """Call OpenRouter API"""
-    url = "https://openrouter.ai/api/v1/chat/completions"
+def call_openrouter_api(prompt, output_format=None):
+    """Call OpenRouter API (structured JSON output when output_format is given)"""
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
@@ -240,76 +683,169 @@ def call_openrouter_api(prompt):
     }
 
     payload = {
-        "model": "meta-llama/llama-3.2-3b-instruct:free",  # Free model
+        "model": OPENROUTER_MODEL,
         "messages": [
             {
                 "role": "user",
                 "content": prompt
             }
-        ]
+        ],
+        **json_output_options(output_format)
     }
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = openrouter_http.post('/api/v1/chat/completions', headers=headers, json=payload)
     response.raise_for_status()
 
     result = response.json()
     return result['choices'][0]['message']['content']
 
 
-@app.route('/api/generate-itinerary', methods=['POST'])
-def generate_itinerary():
-    """
-    Generate travel itinerary for a confirmed location
-    Accepts location_context with detailed place information (state, country, coordinates)
-    """
-    try:
-        data = request.get_json()
-        city = data.get('city', '')
-        days = data.get('days', 3)
-        intensity = data.get('intensity', 'moderate')
-        preferences = data.get('preferences', [])
-        location_context = data.get('location_context', {})
+def stream_cerebras_api(prompt, output_format=None):
+    """Stream Cerebras API response chunks"""
+    cerebras_client = providers.get('cerebras')
 
-        if not city:
-            return jsonify({'error': 'Please provide city name'}), 400
-        
-        # Extract additional location details if provided
-        state = location_context.get('state', '')
-        country = location_context.get('country', '')
-        
-        # Build full location name for better context
-        full_location = city
-        if state and country:
-            full_location = f"{city}, {state}, {country}"
-        elif country:
-            full_location = f"{city}, {country}"
-        
-        logger.info(f"Generating itinerary for: {full_location}")
+    logger.info("📡 Streaming from Cerebras API...")
+    stream = cerebras_client.chat.completions.create(
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a helpful travel planning assistant. Always respond with valid JSON when asked."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        model=CEREBRAS_MODEL,
+        temperature=0.7,
+        top_p=0.8,
+        max_completion_tokens=4000,
+        stream=True,
+        **json_output_options(output_format)
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def stream_gemini_api(prompt, output_format=None):
+    """Stream Gemini API response chunks"""
+    gemini_client = providers.get('gemini')
+
+    logger.info("📡 Streaming from Gemini API...")
+    for chunk in gemini_client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=gemini_config(output_format),
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
+def stream_openrouter_api(prompt, output_format=None):
+    """Stream OpenRouter API response chunks (OpenAI-style SSE)"""
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5173",
+        "X-Title": "TripTeller"
+    }
 
-        if not AI_SERVICE:
-            # Return sample data for testing
-            return jsonify({
-                'itinerary': get_sample_itinerary(city, days)
-            })
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "stream": True,
+        **json_output_options(output_format)
+    }
 
-        # Build intensity-specific requirements
-        intensity_descriptions = {
-            'relaxed': 'Relaxed pace with 2-3 attractions per day, plenty of rest time, focus on leisurely activities and relaxation. Allow 3-4 hours per attraction.',
-            'moderate': 'Balanced pace with 3-4 attractions per day, mix of activities and rest. Allow 2-3 hours per attraction.',
-            'intensive': 'Fast-paced with 4-6 attractions per day, maximize sightseeing, early starts and full days. Allow 1-2 hours per attraction.'
-        }
+    logger.info("📡 Streaming from OpenRouter API...")
+    with openrouter_http.post('/api/v1/chat/completions', headers=headers, json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue
+            data = line[6:]
+            if data == '[DONE]':
+                break
+            try:
+                delta = json.loads(data)['choices'][0]['delta'].get('content')
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
+
+
+AI_CALLERS = {
+    'gemini': call_gemini_api,
+    'cerebras': call_cerebras_api,
+    'openrouter': call_openrouter_api
+}
+AI_STREAMERS = {
+    'gemini': stream_gemini_api,
+    'cerebras': stream_cerebras_api,
+    'openrouter': stream_openrouter_api
+}
+
+ai_router = ProviderRouter(
+    {name: AI_CALLERS[name] for name in AI_PROVIDERS},
+    hedge_enabled=AI_HEDGE_ENABLED,
+    hedge_delay=AI_HEDGE_DELAY,
+    max_workers=AI_ROUTER_WORKERS
+)
+
+
+def itinerary_cache_key(full_location, place_id, days, intensity, preferences, service):
+    """
+    Fingerprint an itinerary request.
+    Prefers the Google place_id; otherwise uses the normalized location string.
+    """
+    if place_id:
+        location_key = f"place_id:{place_id}"
+    else:
+        location_key = ' '.join(full_location.lower().split())
+    normalized_prefs = sorted({str(p).strip().lower() for p in preferences or [] if str(p).strip()})
+    return make_fingerprint(
+        location_key, int(days), str(intensity).lower(), normalized_prefs,
+        service, AI_MODELS.get(service))
+
+
+def build_full_location(city, location_context):
+    """Build full location name for better context"""
+    state = location_context.get('state', '')
+    country = location_context.get('country', '')
+
+    if state and country:
+        return f"{city}, {state}, {country}"
+    elif country:
+        return f"{city}, {country}"
+    return city
+
+
+def build_itinerary_prompt(city, full_location, days, intensity, preferences):
+    """Build the itinerary prompt for the AI service"""
+    # Build intensity-specific requirements
+    intensity_descriptions = {
+        'relaxed': 'Relaxed pace with 2-3 attractions per day, plenty of rest time, focus on leisurely activities and relaxation. Allow 3-4 hours per attraction.',
+        'moderate': 'Balanced pace with 3-4 attractions per day, mix of activities and rest. Allow 2-3 hours per attraction.',
+        'intensive': 'Fast-paced with 4-6 attractions per day, maximize sightseeing, early starts and full days. Allow 1-2 hours per attraction.'
+    }
 
-        intensity_desc = intensity_descriptions.get(
-            intensity, intensity_descriptions['moderate'])
+    intensity_desc = intensity_descriptions.get(
+        intensity, intensity_descriptions['moderate'])
 
-        # Build preferences description
-        preference_desc = ""
-        if preferences:
-            pref_names = ', '.join(preferences)
-            preference_desc = f"\nUser Preferences: Focus on {pref_names} attractions and experiences. Prioritize these categories when selecting destinations."
+    # Build preferences description
+    preference_desc = ""
+    if preferences:
+        pref_names = ', '.join(preferences)
+        preference_desc = f"\nUser Preferences: Focus on {pref_names} attractions and experiences. Prioritize these categories when selecting destinations."
 
-        # Build prompt with full location context
-        prompt = f"""
+    # Build prompt with full location context
+    return f"""
 Create a {days}-day travel itinerary for {full_location} with a {intensity} travel pace.
 
 Travel Intensity: {intensity_desc}{preference_desc}
@@ -358,52 +894,520 @@ Return in JSON format with the following structure:
 Return only JSON, no additional text.
 """
 
-        # Call appropriate AI service (Gemini first, then Cerebras as backup)
-        if AI_SERVICE == 'gemini':
-            response_text = call_gemini_api(prompt)
-        elif AI_SERVICE == 'cerebras':
-            response_text = call_cerebras_api(prompt)
-        elif AI_SERVICE == 'openrouter':
-            response_text = call_openrouter_api(prompt)
-        else:
-            return jsonify({
-                'itinerary': get_sample_itinerary(city, days)
-            })
 
-        # Clean response text
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+def call_ai_service(prompt, output_format):
+    """
+    Call the fastest healthy AI service, hedging with a second one if it is slow.
+    The provider is asked for JSON matching output_format (structured output
+    mode); the reply is returned parsed and validated as a dict. Only output
+    that cannot be repaired or does not match the schema sends the prompt to
+    another provider; raises json.JSONDecodeError if every provider failed.
+    """
+    return ai_router.call(
+        prompt,
+        parse=lambda text: parse_structured(text, output_format),
+        options={'output_format': output_format})
+
+
+def stream_ai_service(prompt, output_format=None):
+    """
+    Stream text chunks from the fastest healthy AI service, failing over to
+    the next one if it errors before its first chunk
+    """
+    return ai_router.stream(AI_STREAMERS, prompt, options={'output_format': output_format})
+
+
+def parse_itinerary_response(response_text):
+    """Parse (repairing near-valid JSON) and validate the itinerary returned by the AI service"""
+    itinerary = parse_structured(response_text, ITINERARY_FORMAT)
+    return flatten_itinerary_places(itinerary)
+
+
+def flatten_itinerary_places(itinerary):
+    """Flatten places list for map display"""
+    all_places = []
+    for day in itinerary.get('schedule', []):
+        all_places.extend(day.get('places', []))
+
+    itinerary['places'] = all_places
+    return itinerary
+
+
+def geocode_bias_bounds(location_context):
+    """Geocoding bounds around the confirmed place's coordinates, or None"""
+    coordinates = location_context.get('coordinates') or {}
+    lat, lng = coordinates.get('lat'), coordinates.get('lng')
+    if lat is None or lng is None:
+        return None
+    d = PLACE_GEOCODE_BIAS_DEGREES
+    return f"{lat - d},{lng - d}|{lat + d},{lng + d}"
 
-        # Parse JSON
-        itinerary = json.loads(response_text)
 
-        # Flatten places list for map display
-        all_places = []
-        for day in itinerary.get('schedule', []):
-            all_places.extend(day.get('places', []))
+def geocode_itinerary_place(name, full_location, city_key, bounds):
+    """{'lat', 'lng'} of an attraction in the trip's city ({} if not found), cached"""
+    key = f"{city_key}|{normalize_place_query(name)}"
+    location = place_geocode_cache.get(key)
+    if location is not None:
+        return location
 
-        itinerary['places'] = all_places
+    places = geocode_flight.do(
+        f"place:{key}", lambda: geocode_places(f"{name}, {full_location}", bounds=bounds))
+    location = places[0]['location'] if places else {}
+    place_geocode_cache.set(key, location, ttl=None if location else GEOCODE_NEGATIVE_TTL)
+    return location
+
+
+def place_located(place):
+    """Whether geocoding is done for a place: it has lat/lng or Google could not find it"""
+    return 'lat' in place or place.get('geocode_failed', False)
+
+
+def enrich_itinerary_locations(itinerary, full_location, location_context):
+    """
+    Add lat/lng to every place of the itinerary (schedule and the flattened
+    places list share the same dicts), geocoding all names concurrently.
+    Places Google has no result for get geocode_failed instead, so they are
+    not looked up again; places that cannot be geocoded within
+    PLACE_GEOCODE_TIMEOUT keep neither and are retried on the next cache hit.
+    """
+    if not GOOGLE_MAPS_API_KEY:
+        return itinerary
+
+    pending = {}
+    for day in itinerary.get('schedule', []):
+        for place in day.get('places', []):
+            if place.get('name') and not place_located(place):
+                pending.setdefault(place['name'], []).append(place)
+    if not pending:
+        return itinerary
+
+    city_key = location_context.get('place_id') or normalize_place_query(full_location)
+    bounds = geocode_bias_bounds(location_context)
+    futures = {
+        place_geocode_executor.submit(geocode_itinerary_place, name, full_location, city_key, bounds): name
+        for name in pending
+    }
+    done, not_done = wait(futures, timeout=PLACE_GEOCODE_TIMEOUT)
+    if not_done:
+        logger.warning(f"Geocoding {len(not_done)} itinerary place(s) timed out after {PLACE_GEOCODE_TIMEOUT}s")
+    located = 0
+    for future in done:
+        try:
+            location = future.result()
+        except Exception as e:
+            logger.warning(f"Geocoding {futures[future]} failed: {e}")
+            continue
+        for place in pending[futures[future]]:
+            if location:
+                place['lat'] = location['lat']
+                place['lng'] = location['lng']
+            else:
+                place['geocode_failed'] = True
+        located += bool(location)
+
+    # The flattened list is rebuilt in case it was loaded separately (e.g. from the cache)
+    flatten_itinerary_places(itinerary)
+    logger.info(f"📍 Located {located}/{len(pending)} itinerary place(s)")
+    return itinerary
+
+
+def get_cached_itinerary(cache_key, full_location, location_context):
+    """
+    Cached itinerary for cache_key, or None. The cached dict is shared and
+    never changed in place: if some places were not geocoded yet (their
+    geocoding timed out), a copy is enriched and written back instead.
+    """
+    itinerary = itinerary_cache.get(cache_key)
+    if itinerary is None or not GOOGLE_MAPS_API_KEY:
+        return itinerary
+    if all(place_located(place) for day in itinerary.get('schedule', [])
+           for place in day.get('places', []) if place.get('name')):
+        return itinerary
+    itinerary = enrich_itinerary_locations(copy.deepcopy(itinerary), full_location, location_context)
+    itinerary_cache.set(cache_key, itinerary)
+    return itinerary
+
+
+def narration_text(place_name, description):
+    """Text narrated for a place (also determines its narration cache key)"""
+    return f"{place_name}. {description}"
+
+
+def queue_narrations(itinerary, presynthesize, client_id):
+    """
+    Queue narrations for the places of an itinerary in schedule order.
+    presynthesize: True for all places (up to NARRATION_PRESYNTH_MAX) or a number N for the first N.
+    """
+    if not presynthesize or not ELEVENLABS_API_KEY:
+        return 0
+    limit = NARRATION_PRESYNTH_MAX
+    if presynthesize is not True:
+        limit = min(int(presynthesize), NARRATION_PRESYNTH_MAX)
+
+    texts = [
+        narration_text(place.get('name', ''), place.get('description', ''))
+        for place in itinerary.get('places', []) if place.get('name')
+    ][:limit]
+    queued = narration_prefetcher.submit(client_id, texts)
+    logger.info(f"🎙️ Queued {queued} narration(s) for pre-synthesis")
+    return queued
+
+
+def get_client_id():
+    """Identify the browser session for per-client background work"""
+    return request.headers.get('X-Client-Id') or request.remote_addr
+
+
+def build_outline_prompt(full_location, days, intensity, preferences):
+    """Build a short prompt asking only for the theme/area of each day"""
+    focus = f"Focus on {', '.join(preferences)}." if preferences else "Include a diverse mix of experiences."
+    return f"""
+Plan the outline of a {days}-day {intensity} trip to {full_location}. {focus}
+Give each day a theme and the neighborhood or area it covers so days do not overlap.
+
+Return in JSON format with the following structure:
+{{
+    "outline": [
+        {{"day": 1, "theme": "Day theme", "area": "Neighborhood or area"}}
+    ],
+    "tips": ["Tip 1", "Tip 2", "Tip 3"]
+}}
+
+Return only JSON, no additional text.
+"""
+
+
+def build_day_prompt(full_location, day_plan, outline, intensity, preferences):
+    """Build the prompt for a single day of a parallel itinerary"""
+    day_number = day_plan.get('day')
+    other_days = '; '.join(
+        f"Day {d.get('day')}: {d.get('theme')} ({d.get('area')})"
+        for d in outline if d.get('day') != day_number
+    ) or 'none'
+    focus = f"Prioritize {', '.join(preferences)} attractions." if preferences else "Include a diverse mix of attractions."
+
+    return f"""
+Plan day {day_number} of a {intensity} trip to {full_location}.
+Theme: {day_plan.get('theme', '')}
+Area: {day_plan.get('area', '')}
+Other days (do not repeat their attractions): {other_days}
+
+Requirements:
+1. Choose the number of attractions for a {intensity} pace. {focus}
+2. Include attraction name, description, suggested duration, category (historical, natural, food, culture, shopping, adventure, nightlife, art, etc.)
+3. Consider travel time between attractions
+4. For each attraction, include ticket information (requires_ticket, ticket_price, booking_url, source "AI Generated", notes)
+
+Return in JSON format with the following structure:
+{{
+    "day": {day_number},
+    "places": [
+        {{
+            "name": "Attraction Name",
+            "description": "Detailed description (100-150 words)",
+            "duration": "Suggested duration",
+            "category": "Category",
+            "ticket_info": {{
+                "requires_ticket": true/false,
+                "ticket_price": "price or Free",
+                "booking_url": "search URL",
+                "source": "AI Generated",
+                "notes": "ticket information"
+            }}
+        }}
+    ]
+}}
+
+Return only JSON, no additional text.
+"""
+
+
+def generate_itinerary_parallel(city, full_location, days, intensity, preferences):
+    """
+    Generate an itinerary by first asking for a day-by-day outline, then
+    generating every day concurrently. Days whose output fails to parse are
+    retried on their own; the rest of the trip is kept. An outline with
+    fewer days than asked for is requested again.
+    Raises json.JSONDecodeError if the outline or a day still cannot be parsed.
+    """
+    prompt = build_outline_prompt(full_location, days, intensity, preferences)
+    for attempt in range(ITINERARY_DAY_RETRIES + 1):
+        outline_data = call_ai_service(prompt, OUTLINE_FORMAT)
+        outline = outline_data['outline'][:int(days)]
+        if len(outline) == int(days):
+            break
+        logger.warning(f"Outline has {len(outline)} of {days} day(s) (attempt {attempt + 1})")
+    else:
+        raise json.JSONDecodeError(f"Itinerary outline has {len(outline)} of {days} day(s)", '', 0)
+    for index, day_plan in enumerate(outline):
+        day_plan['day'] = index + 1
+
+    def generate_day(day_plan):
+        prompt = build_day_prompt(full_location, day_plan, outline, intensity, preferences)
+        day = call_ai_service(prompt, DAY_FORMAT)
+        day['day'] = day_plan['day']
+        return day
+
+    results = {}
+    pending = list(outline)
+    for attempt in range(ITINERARY_DAY_RETRIES + 1):
+        failed = []
+        with ThreadPoolExecutor(max_workers=min(ITINERARY_DAY_WORKERS, len(pending))) as executor:
+            futures = {executor.submit(generate_day, day_plan): day_plan for day_plan in pending}
+            for future in as_completed(futures):
+                day_plan = futures[future]
+                try:
+                    results[day_plan['day']] = future.result()
+                except Exception as e:
+                    logger.warning(f"Day {day_plan['day']} failed (attempt {attempt + 1}): {e}")
+                    failed.append(day_plan)
+        if not failed:
+            break
+        pending = failed
+
+    if len(results) != len(outline):
+        missing = sorted(d['day'] for d in outline if d['day'] not in results)
+        raise json.JSONDecodeError(f"Could not generate day(s) {missing}", '', 0)
+
+    itinerary = {
+        'city': city,
+        'days': days,
+        'schedule': [results[day_plan['day']] for day_plan in outline],
+        'tips': outline_data['tips']
+    }
+    return flatten_itinerary_places(itinerary)
+
+
+@app.route('/api/generate-itinerary', methods=['POST'])
+def generate_itinerary():
+    """
+    Generate travel itinerary for a confirmed location
+    Accepts location_context with detailed place information (state, country, coordinates)
+    """
+    try:
+        data = request.get_json()
+        city = data.get('city', '')
+        days = data.get('days', 3)
+        intensity = data.get('intensity', 'moderate')
+        preferences = data.get('preferences', [])
+        location_context = data.get('location_context', {})
+
+        if not city:
+            return jsonify({'error': 'Please provide city name'}), 400
+
+        full_location = build_full_location(city, location_context)
+        logger.info(f"Generating itinerary for: {full_location}")
+
+        if not AI_SERVICE:
+            # Return sample data for testing
+            return jsonify({
+                'itinerary': enrich_itinerary_locations(
+                    get_sample_itinerary(city, days), full_location, location_context)
+            })
+
+        cache_key = itinerary_cache_key(
+            full_location, location_context.get('place_id'),
+            days, intensity, preferences, AI_SERVICE)
+        cached_itinerary = get_cached_itinerary(cache_key, full_location, location_context)
+        if cached_itinerary is not None:
+            logger.info(f"⚡ Itinerary cache hit for {full_location}")
+            queue_narrations(cached_itinerary, data.get('presynthesize'), get_client_id())
+            return jsonify({'itinerary': cached_itinerary, 'cache': 'hit'})
+
+        parallel = data.get('parallel', ITINERARY_PARALLEL_MIN_DAYS > 0 and int(days) >= ITINERARY_PARALLEL_MIN_DAYS)
+
+        def generate():
+            if parallel:
+                result = generate_itinerary_parallel(city, full_location, days, intensity, preferences)
+            else:
+                prompt = build_itinerary_prompt(city, full_location, days, intensity, preferences)
+                result = flatten_itinerary_places(call_ai_service(prompt, ITINERARY_FORMAT))
+            enrich_itinerary_locations(result, full_location, location_context)
+            itinerary_cache.set(cache_key, result)
+            return {'itinerary': result, 'cache': 'miss'}
+
+        # Concurrent identical requests (streamed or not) wait for the same generation
+        itinerary = itinerary_flight.do(cache_key, generate)['itinerary']
+        queue_narrations(itinerary, data.get('presynthesize'), get_client_id())
 
         logger.info(
             f"Successfully generated itinerary for {city} using {AI_SERVICE}")
-        return jsonify({'itinerary': itinerary})
+        return jsonify({'itinerary': itinerary, 'cache': 'miss'})
 
     except json.JSONDecodeError as e:
         logger.error(f"JSON parsing error: {str(e)}")
         # Return sample data
         return jsonify({
-            'itinerary': get_sample_itinerary(city, days)
+            'itinerary': enrich_itinerary_locations(
+                get_sample_itinerary(city, days), full_location, location_context)
         })
     except Exception as e:
         logger.error(f"Error generating itinerary: {str(e)}")
         return jsonify({'error': f'Failed to generate itinerary: {str(e)}'}), 500
 
 
+def sse_event(event, data):
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def replay_itinerary_events(itinerary, cache_status):
+    """Send a finished itinerary through the same event sequence as a streamed one"""
+    for day_index, day in enumerate(itinerary.get('schedule', [])):
+        for place_index, place in enumerate(day.get('places', [])):
+            yield 'place', {'day_index': day_index, 'place_index': place_index, 'place': place}
+        yield 'day', {'day_index': day_index, 'day': day}
+    yield 'done', {'itinerary': itinerary, 'cache': cache_status}
+
+
+def stream_itinerary_events(data, client_id):
+    """
+    Generate an itinerary for a request body (as sent to /api/generate-itinerary)
+    and yield (event, payload) pairs: `place` and `day` as soon as they are
+    complete in the AI output, then `done` with the full itinerary or `error`.
+    Concurrent identical requests share one generation (itinerary_flight);
+    the ones that waited get the finished itinerary replayed as events.
+    """
+    city = data.get('city', '')
+    days = data.get('days', 3)
+    intensity = data.get('intensity', 'moderate')
+    preferences = data.get('preferences', [])
+    location_context = data.get('location_context', {})
+    presynthesize = data.get('presynthesize')
+
+    full_location = build_full_location(city, location_context)
+    logger.info(f"Streaming itinerary for: {full_location}")
+
+    if not AI_SERVICE:
+        yield from replay_itinerary_events(enrich_itinerary_locations(
+            get_sample_itinerary(city, days), full_location, location_context), 'sample')
+        return
+
+    cache_key = itinerary_cache_key(
+        full_location, location_context.get('place_id'),
+        days, intensity, preferences, AI_SERVICE)
+    cached_itinerary = get_cached_itinerary(cache_key, full_location, location_context)
+    if cached_itinerary is not None:
+        logger.info(f"⚡ Itinerary cache hit for {full_location}")
+        queue_narrations(cached_itinerary, presynthesize, client_id)
+        yield from replay_itinerary_events(cached_itinerary, 'hit')
+        return
+
+    events = queue.Queue()
+    finished = object()
+    led = []
+    outcome = {}
+
+    def generate():
+        # Only the leader streams from the AI service; its events go to this request
+        led.append(True)
+        return generate_streamed_itinerary(
+            city, full_location, days, intensity, preferences,
+            location_context, cache_key, events.put)
+
+    def run():
+        # Keeps running if the client disconnects, so the result still reaches the cache
+        try:
+            outcome['result'] = itinerary_flight.do(cache_key, generate)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            events.put(finished)
+
+    itinerary_stream_executor.submit(run)
+    while True:
+        event = events.get()
+        if event is finished:
+            break
+        yield event
+
+    error = outcome.get('error')
+    if isinstance(error, json.JSONDecodeError):
+        # Raised by a non-streamed leader whose output could not be parsed
+        logger.error(f"JSON parsing error: {str(error)}")
+        yield from replay_itinerary_events(enrich_itinerary_locations(
+            get_sample_itinerary(city, days), full_location, location_context), 'sample')
+        return
+    if error is not None:
+        logger.error(f"Error streaming itinerary: {str(error)}")
+        yield 'error', {'error': f'Failed to generate itinerary: {str(error)}'}
+        return
+
+    result = outcome['result']
+    queue_narrations(result['itinerary'], presynthesize, client_id)
+    if led and result['cache'] == 'miss':
+        yield 'done', result
+    else:
+        # Waited for an identical request (or fell back to the sample):
+        # send the finished itinerary through the same events
+        yield from replay_itinerary_events(result['itinerary'], result['cache'])
+
+
+def generate_streamed_itinerary(city, full_location, days, intensity, preferences,
+                                location_context, cache_key, emit):
+    """
+    Stream an itinerary from the AI service, passing each `place` / `day`
+    event to emit() as soon as it is complete in the output. Returns
+    {'itinerary': ..., 'cache': 'miss' | 'sample'}; raises if the stream
+    failed before the first day was complete.
+    """
+    parser = IncrementalItineraryParser()
+    try:
+        prompt = build_itinerary_prompt(city, full_location, days, intensity, preferences)
+        for chunk in stream_ai_service(prompt, ITINERARY_FORMAT):
+            for event in parser.feed(chunk):
+                emit(event)
+    except Exception as e:
+        if not parser.days:
+            raise
+        logger.error(f"Error streaming itinerary: {str(e)}")
+
+    try:
+        itinerary = parse_itinerary_response(parser.text())
+        enrich_itinerary_locations(itinerary, full_location, location_context)
+        itinerary_cache.set(cache_key, itinerary)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing error: {str(e)}")
+        if not parser.days:
+            return {
+                'itinerary': enrich_itinerary_locations(
+                    get_sample_itinerary(city, days), full_location, location_context),
+                'cache': 'sample'
+            }
+        # Keep the days that were already streamed
+        itinerary = flatten_itinerary_places({
+            'city': city,
+            'days': days,
+            'schedule': parser.days,
+            'tips': []
+        })
+        enrich_itinerary_locations(itinerary, full_location, location_context)
+
+    logger.info(
+        f"Successfully streamed itinerary for {city} using {AI_SERVICE}")
+    return {'itinerary': itinerary, 'cache': 'miss'}
+
+
+@app.route('/api/generate-itinerary/stream', methods=['POST'])
+def generate_itinerary_stream():
+    """
+    Streaming variant of generate-itinerary (Server-Sent Events).
+    Emits a `place` event for each attraction and a `day` event for each day
+    as soon as they are complete in the AI output, then a final `done` event
+    with the full itinerary (same shape as /api/generate-itinerary).
+    """
+    data = request.get_json() or {}
+    if not data.get('city'):
+        return jsonify({'error': 'Please provide city name'}), 400
+
+    events = stream_itinerary_events(data, get_client_id())
+    return Response(
+        stream_with_context(sse_event(event, payload) for event, payload in events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/generate-audio', methods=['POST'])
 def generate_audio():
     """Generate attraction audio narration"""
@@ -418,68 +1422,299 @@ def generate_audio():
         if not ELEVENLABS_API_KEY:
             # Return sample audio URL
             return jsonify({
-                'audio_url': 'https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3',
+                'audio_url': SAMPLE_AUDIO_URL,
                 'message': 'ElevenLabs API not configured, returning sample audio'
             })
 
-        # Generate narration text
-        text = f"{place_name}. {description}"
+        # Generate narration text
+        text = narration_text(place_name, description)
+
+        # Use ElevenLabs to generate voice (using new client API)
+        try:
+            # Narrations are stored under a hash of text/voice/model/format,
+            # so a replay is a disk read instead of a new synthesis
+            audio_filename = narration_store.lookup(text)
+            audio_store.record_lookup(audio_filename is not None)
+            cache_status = 'hit'
+            if not audio_filename:
+                # Identical concurrent requests share one synthesis
+                audio_filename, cached = synthesize_cached_narration(text)
+                cache_status = 'hit' if cached else 'miss'
+                logger.info(f"✅ Successfully generated audio for {place_name}")
+
+            # Return audio URL
+            return jsonify({
+                'audio_url': f'/api/audio/{audio_filename}',
+                'place_name': place_name,
+                'cache': cache_status
+            })
+        except ImportError as e:
+            logger.warning(f"ElevenLabs library not installed: {e}")
+            return jsonify({
+                'audio_url': SAMPLE_AUDIO_URL,
+                'message': 'ElevenLabs library not installed, returning sample audio'
+            })
+        except Exception as e:
+            logger.error(f"Error calling ElevenLabs API: {str(e)}")
+            return jsonify({
+                'audio_url': SAMPLE_AUDIO_URL,
+                'message': f'Failed to generate audio: {str(e)}'
+            })
+
+    except Exception as e:
+        logger.error(f"Error generating audio: {str(e)}")
+        return jsonify({'error': f'Failed to generate audio: {str(e)}'}), 500
+
+
+@app.route('/api/narration/stream', methods=['GET', 'POST'])
+def stream_narration():
+    """
+    Stream narration audio directly (audio/mpeg, chunked).
+    Takes place_name and description as query parameters (GET, usable as an
+    <audio> src) or JSON (POST). Chunks are forwarded as ElevenLabs produces
+    them while being written to the narration cache; cached narrations are
+    served from disk.
+    """
+    try:
+        data = request.get_json(silent=True) or request.args
+        place_name = data.get('place_name', '')
+        description = data.get('description', '')
+
+        if not place_name:
+            return jsonify({'error': 'Please provide place name'}), 400
+
+        if not ELEVENLABS_API_KEY:
+            return redirect(SAMPLE_AUDIO_URL)
+
+        text = narration_text(place_name, description)
+
+        audio_filename = narration_store.lookup(text)
+        audio_store.record_lookup(audio_filename is not None)
+        if audio_filename:
+            return serve_audio(audio_filename)
+
+        if audio_flight.in_flight(narration_store.key(text)):
+            # Pre-synthesis (or /api/generate-audio) is already producing this
+            # narration; wait for it rather than pay for a second synthesis
+            audio_filename, _ = synthesize_cached_narration(text)
+            return serve_audio(audio_filename)
+
+        chunks = narration_store.open_stream(text)
+        if chunks is None:
+            # Same narration is already streaming to another client
+            audio_filename = narration_store.wait_for_stream(text)
+            if audio_filename:
+                return serve_audio(audio_filename)
+            return jsonify({'error': 'Failed to generate audio'}), 502
+
+        logger.info(f"🔊 Streaming narration for {place_name}")
+        return Response(
+            chunks,
+            mimetype='audio/mpeg',
+            headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+        )
+
+    except ImportError as e:
+        logger.warning(f"ElevenLabs library not installed: {e}")
+        return redirect(SAMPLE_AUDIO_URL)
+    except Exception as e:
+        logger.error(f"Error streaming audio: {str(e)}")
+        return jsonify({'error': f'Failed to generate audio: {str(e)}'}), 502
+
+
+def save_day_playlist(day):
+    """Store the places of an itinerary day and return (playlist_id, playlist)"""
+    places = [
+        {
+            'name': place.get('name', ''),
+            'description': place.get('description', ''),
+            'text': narration_text(place.get('name', ''), place.get('description', ''))
+        }
+        for place in day.get('places', []) if place.get('name')
+    ]
+    playlist = {'day': day.get('day'), 'places': places}
+    # Same places, same voice settings -> same id (and the same cached clips)
+    playlist_id = make_fingerprint([narration_store.key(place['text']) for place in places])[:32]
+    playlist_cache.set(playlist_id, playlist)
+    return playlist_id, playlist
+
+
+def estimate_narration_seconds(text, filename=None):
+    """Clip duration from its file size at NARRATION_BITRATE, or from the word count"""
+    if filename:
+        try:
+            return round(os.path.getsize(narration_store.path(filename)) * 8 / NARRATION_BITRATE, 1)
+        except OSError:
+            pass
+    # Roughly 2.5 spoken words per second
+    return round(len(text.split()) / 2.5, 1)
+
+
+def day_playlist_manifest(playlist_id, playlist):
+    """JSON manifest: one track per place, cached clips point at their audio files"""
+    tracks = []
+    for index, place in enumerate(playlist['places']):
+        filename = narration_store.lookup(place['text']) if ELEVENLABS_API_KEY else None
+        if filename:
+            audio_url = f'/api/audio/{filename}'
+        elif ELEVENLABS_API_KEY:
+            audio_url = (f"/api/narration/stream?place_name={quote(place['name'])}"
+                         f"&description={quote(place['description'])}")
+        else:
+            audio_url = SAMPLE_AUDIO_URL
+        tracks.append({
+            'index': index,
+            'place_name': place['name'],
+            'audio_url': audio_url,
+            'cached': filename is not None,
+            'duration': estimate_narration_seconds(place['text'], filename)
+        })
+    return {
+        'playlist_id': playlist_id,
+        'day': playlist.get('day'),
+        'tracks': tracks,
+        'cached': sum(1 for track in tracks if track['cached']),
+        'duration': round(sum(track['duration'] for track in tracks), 1),
+        'stream_url': f'/api/narration/playlist/{playlist_id}.mp3',
+        'm3u8_url': f'/api/narration/playlist/{playlist_id}.m3u8'
+    }
+
+
+def day_playlist_m3u8(manifest):
+    """HLS-style VOD playlist with one MP3 segment per place"""
+    target = max([int(track['duration']) + 1 for track in manifest['tracks']] or [1])
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{target}',
+             '#EXT-X-PLAYLIST-TYPE:VOD', '#EXT-X-MEDIA-SEQUENCE:0']
+    for track in manifest['tracks']:
+        lines.append(f"#EXTINF:{track['duration']},{track['place_name']}")
+        lines.append(track['audio_url'])
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def resolve_narration_clip(text):
+    """Filename of the cached narration for text, synthesizing it if missing"""
+    return narration_store.lookup(text) or synthesize_cached_narration(text)[0]
+
+
+def stream_day_narration(texts):
+    """
+    Yield the frames of each narration in order as one continuous MP3.
+    Cached clips are read from disk; missing ones are synthesized up to
+    PLAYLIST_LOOKAHEAD places ahead of the one being played.
+    """
+    futures = []
+
+    def schedule(index):
+        if index < len(texts):
+            futures.append(playlist_executor.submit(resolve_narration_clip, texts[index]))
+
+    for index in range(min(len(texts), PLAYLIST_LOOKAHEAD + 1)):
+        schedule(index)
+    try:
+        for index in range(len(texts)):
+            future = futures[index]
+            schedule(index + PLAYLIST_LOOKAHEAD + 1)
+            try:
+                filename = future.result()
+            except Exception as e:
+                # Skip the place rather than end the day's audio
+                logger.warning(f"Skipping narration in day playlist: {e}")
+                continue
+            audio_store.touch(filename)
+            yield mp3.read_frames(narration_store.path(filename))
+    finally:
+        # Client went away: drop clips that have not started (started ones still get cached)
+        for future in futures:
+            future.cancel()
+
+
+def render_day_playlist(playlist_id, playlist, output_format):
+    """Respond with the manifest (json / m3u8) or the joined audio stream (mp3)"""
+    if output_format == 'mp3':
+        if not ELEVENLABS_API_KEY:
+            return redirect(SAMPLE_AUDIO_URL)
+        logger.info(f"🔊 Streaming day playlist {playlist_id} ({len(playlist['places'])} places)")
+        return Response(
+            stream_day_narration([place['text'] for place in playlist['places']]),
+            mimetype='audio/mpeg',
+            headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+        )
+
+    manifest = day_playlist_manifest(playlist_id, playlist)
+    if ELEVENLABS_API_KEY:
+        # Start on the missing clips now so per-track playback finds them cached
+        missing = [place['text'] for place, track in zip(playlist['places'], manifest['tracks'])
+                   if not track['cached']]
+        narration_prefetcher.submit(f'playlist:{playlist_id}', missing)
+    if output_format == 'm3u8':
+        return Response(day_playlist_m3u8(manifest), mimetype='application/vnd.apple.mpegurl')
+    return jsonify(manifest)
 
-        # Use ElevenLabs to generate voice (using new client API)
-        try:
-            from elevenlabs.client import ElevenLabs
-            
-            # Initialize ElevenLabs client
-            client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-            
-            # Generate audio using text-to-speech
-            audio_generator = client.text_to_speech.convert(
-                text=text,
-                voice_id="JBFqnCBsd6RMkjVDRZzb",  # George voice (clear, professional)
-                model_id="eleven_multilingual_v2",  # Supports multiple languages
-                output_format="mp3_44100_128",
-            )
-            
-            # Save audio file
-            audio_filename = f"{place_name.replace(' ', '_').replace('/', '_')}.mp3"
-            audio_path = os.path.join(AUDIO_FOLDER, audio_filename)
-            
-            # Write audio bytes to file
-            with open(audio_path, 'wb') as audio_file:
-                for chunk in audio_generator:
-                    audio_file.write(chunk)
 
-            logger.info(f"✅ Successfully generated audio for {place_name}")
+@app.route('/api/narration/playlist', methods=['POST'])
+def create_day_playlist():
+    """
+    Build a narration playlist for one itinerary day.
+    Body: {"day": {"day": 1, "places": [...]}, "format": "json" | "m3u8" | "mp3"}.
+    "mp3" streams the whole day as one audio response right away; the
+    manifest formats list per-place clips plus stream_url for later GETs.
+    """
+    try:
+        data = request.get_json() or {}
+        day = data.get('day')
+        output_format = data.get('format', 'json')
 
-            # Return audio URL
-            return jsonify({
-                'audio_url': f'/api/audio/{audio_filename}',
-                'place_name': place_name
-            })
-        except ImportError as e:
-            logger.warning(f"ElevenLabs library not installed: {e}")
-            return jsonify({
-                'audio_url': 'https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3',
-                'message': 'ElevenLabs library not installed, returning sample audio'
-            })
-        except Exception as e:
-            logger.error(f"Error calling ElevenLabs API: {str(e)}")
-            return jsonify({
-                'audio_url': 'https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3',
-                'message': f'Failed to generate audio: {str(e)}'
-            })
+        if not isinstance(day, dict) or not day.get('places'):
+            return jsonify({'error': 'Please provide a day with places'}), 400
+        if output_format not in ('json', 'm3u8', 'mp3'):
+            return jsonify({'error': 'format must be json, m3u8 or mp3'}), 400
 
+        playlist_id, playlist = save_day_playlist(day)
+        return render_day_playlist(playlist_id, playlist, output_format)
     except Exception as e:
-        logger.error(f"Error generating audio: {str(e)}")
-        return jsonify({'error': f'Failed to generate audio: {str(e)}'}), 500
+        logger.error(f"Error building day playlist: {str(e)}")
+        return jsonify({'error': f'Failed to build playlist: {str(e)}'}), 500
+
+
+@app.route('/api/narration/playlist/<playlist_id>.<output_format>', methods=['GET'])
+def get_day_playlist(playlist_id, output_format):
+    """Fetch a stored day playlist as json, m3u8 or the joined mp3 stream"""
+    if output_format not in ('json', 'm3u8', 'mp3'):
+        return jsonify({'error': 'format must be json, m3u8 or mp3'}), 400
+    playlist = playlist_cache.get(playlist_id)
+    if playlist is None:
+        return jsonify({'error': 'Playlist not found or expired'}), 404
+    return render_day_playlist(playlist_id, playlist, output_format)
 
 
 @app.route('/api/audio/<filename>', methods=['GET'])
 def serve_audio(filename):
-    """Serve audio files"""
+    """
+    Serve audio files.
+    Supports Range requests (206) for seeking and conditional GETs
+    (ETag / If-None-Match, Last-Modified / If-Modified-Since). The file body
+    goes through wsgi.file_wrapper, which servers such as gunicorn send with
+    sendfile(); set USE_X_SENDFILE=true when a front proxy serves the files.
+    """
     try:
+        if not audio_store.contains(filename):
+            return jsonify({'error': 'Audio file not found'}), 404
+        audio_store.touch(filename)
         audio_path = os.path.join(AUDIO_FOLDER, filename)
-        return send_file(audio_path, mimetype='audio/mpeg')
+
+        if NarrationStore.is_hashed_name(filename):
+            # Content-hashed names never change: the hash is a strong ETag
+            # and browsers may keep the file for a year without revalidating
+            response = send_file(
+                audio_path, mimetype='audio/mpeg', conditional=True,
+                etag=filename[:-4], max_age=AUDIO_CACHE_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+
+        # Other names may be rewritten, so clients revalidate with ETag / Last-Modified
+        return send_file(audio_path, mimetype='audio/mpeg', conditional=True)
     except Exception as e:
         logger.error(f"Error serving audio: {str(e)}")
         return jsonify({'error': 'Audio file not found'}), 404
@@ -508,217 +1743,6 @@ def generate_poster():
         return jsonify({'error': f'Failed to generate poster: {str(e)}'}), 500
 
 
-def search_ticket_info(attraction_name, city):
-    """Search for ticket information for an attraction"""
-    try:
-        logger.info(f"Searching ticket info for: {attraction_name} in {city}")
-        
-        # Multiple search strategies
-        ticket_info = None
-        
-        # Strategy 1: Search TripAdvisor
-        ticket_info = search_tripadvisor_tickets(attraction_name, city)
-        if ticket_info:
-            return ticket_info
-            
-        # Strategy 2: Search Viator
-        ticket_info = search_viator_tickets(attraction_name, city)
-        if ticket_info:
-            return ticket_info
-            
-        # Strategy 3: Search GetYourGuide
-        ticket_info = search_getyourguide_tickets(attraction_name, city)
-        if ticket_info:
-            return ticket_info
-            
-        # Strategy 4: Generic search
-        ticket_info = search_generic_tickets(attraction_name, city)
-        if ticket_info:
-            return ticket_info
-            
-        # Default response if no tickets found
-        return {
-            'requires_ticket': False,
-            'ticket_price': None,
-            'booking_url': None,
-            'source': 'No ticket information found',
-            'notes': 'This attraction may be free to visit or tickets may be available on-site'
-        }
-        
-    except Exception as e:
-        logger.error(f"Error searching ticket info: {str(e)}")
-        return {
-            'requires_ticket': False,
-            'ticket_price': None,
-            'booking_url': None,
-            'source': 'Error',
-            'notes': f'Unable to determine ticket requirements: {str(e)}'
-        }
-
-
-def search_tripadvisor_tickets(attraction_name, city):
-    """Search TripAdvisor for ticket information"""
-    try:
-        # Construct search query
-        search_query = f"{attraction_name} {city} tickets"
-        
-        # Use a web search API or scraping approach
-        # For now, return a structured response based on common patterns
-        attraction_lower = attraction_name.lower()
-        
-        # Common paid attractions
-        paid_keywords = ['museum', 'palace', 'castle', 'tower', 'aquarium', 'zoo', 'theme park', 'gallery', 'exhibition']
-        free_keywords = ['park', 'square', 'beach', 'market', 'street', 'district', 'neighborhood']
-        
-        requires_ticket = any(keyword in attraction_lower for keyword in paid_keywords)
-        
-        if requires_ticket:
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'Varies (check official website)',
-                'booking_url': f'https://www.tripadvisor.com/Attraction_Products-g{get_city_code(city)}-{attraction_name.replace(" ", "_")}.html',
-                'source': 'TripAdvisor',
-                'notes': 'Tickets may be available online or at the venue'
-            }
-        elif any(keyword in attraction_lower for keyword in free_keywords):
-            return {
-                'requires_ticket': False,
-                'ticket_price': 'Free',
-                'booking_url': None,
-                'source': 'TripAdvisor',
-                'notes': 'This attraction is typically free to visit'
-            }
-            
-        return None
-        
-    except Exception as e:
-        logger.error(f"TripAdvisor search error: {str(e)}")
-        return None
-
-
-def search_viator_tickets(attraction_name, city):
-    """Search Viator for ticket information"""
-    try:
-        # Construct Viator search URL
-        search_query = f"{attraction_name} {city}"
-        viator_url = f"https://www.viator.com/searchResults/all?text={quote(search_query)}"
-        
-        # For demonstration, return structured data
-        attraction_lower = attraction_name.lower()
-        
-        # Check if it's likely a paid attraction
-        paid_indicators = ['museum', 'palace', 'castle', 'tower', 'aquarium', 'zoo', 'theme park']
-        
-        if any(indicator in attraction_lower for indicator in paid_indicators):
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'From $10-50 (varies by attraction)',
-                'booking_url': viator_url,
-                'source': 'Viator',
-                'notes': 'Skip-the-line tickets available'
-            }
-            
-        return None
-        
-    except Exception as e:
-        logger.error(f"Viator search error: {str(e)}")
-        return None
-
-
-def search_getyourguide_tickets(attraction_name, city):
-    """Search GetYourGuide for ticket information"""
-    try:
-        search_query = f"{attraction_name} {city}"
-        getyourguide_url = f"https://www.getyourguide.com/s/?q={quote(search_query)}"
-        
-        # Similar logic to Viator
-        attraction_lower = attraction_name.lower()
-        
-        if any(keyword in attraction_lower for keyword in ['museum', 'palace', 'castle', 'tower']):
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'From €8-25 (varies by attraction)',
-                'booking_url': getyourguide_url,
-                'source': 'GetYourGuide',
-                'notes': 'Instant confirmation and mobile tickets'
-            }
-            
-        return None
-        
-    except Exception as e:
-        logger.error(f"GetYourGuide search error: {str(e)}")
-        return None
-
-
-def search_generic_tickets(attraction_name, city):
-    """Generic ticket search using common patterns"""
-    try:
-        attraction_lower = attraction_name.lower()
-        
-        # Museum pattern
-        if 'museum' in attraction_lower:
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'Typically $10-20',
-                'booking_url': f'https://www.google.com/search?q={quote(f"{attraction_name} {city} tickets")}',
-                'source': 'General Search',
-                'notes': 'Most museums require tickets. Check official website for current prices.'
-            }
-        
-        # Theme park pattern
-        if any(keyword in attraction_lower for keyword in ['theme park', 'amusement park', 'park']):
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'Typically $30-100+',
-                'booking_url': f'https://www.google.com/search?q={quote(f"{attraction_name} {city} tickets")}',
-                'source': 'General Search',
-                'notes': 'Theme parks require tickets. Advance booking recommended.'
-            }
-        
-        # Historical site pattern
-        if any(keyword in attraction_lower for keyword in ['palace', 'castle', 'fortress', 'tower']):
-            return {
-                'requires_ticket': True,
-                'ticket_price': 'Typically $5-25',
-                'booking_url': f'https://www.google.com/search?q={quote(f"{attraction_name} {city} tickets")}',
-                'source': 'General Search',
-                'notes': 'Historical sites often require tickets. Audio guides may be extra.'
-            }
-        
-        # Free attraction pattern
-        if any(keyword in attraction_lower for keyword in ['park', 'square', 'beach', 'market', 'street']):
-            return {
-                'requires_ticket': False,
-                'ticket_price': 'Free',
-                'booking_url': None,
-                'source': 'General Search',
-                'notes': 'This attraction is typically free to visit'
-            }
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"Generic search error: {str(e)}")
-        return None
-
-
-def get_city_code(city):
-    """Get city code for TripAdvisor (simplified)"""
-    city_codes = {
-        'tokyo': '298184',
-        'paris': '187147',
-        'london': '186338',
-        'new york': '60763',
-        'rome': '187791',
-        'barcelona': '187497',
-        'amsterdam': '188590',
-        'berlin': '187275',
-        'madrid': '187514',
-        'vienna': '190454'
-    }
-    return city_codes.get(city.lower(), '187147')  # Default to Paris
-
-
 @app.route('/api/get-ticket-info', methods=['POST'])
 def get_ticket_info():
     """Get ticket information for an attraction"""
@@ -731,7 +1755,7 @@ def get_ticket_info():
             return jsonify({'error': 'Please provide attraction name'}), 400
 
         # Search for ticket information
-        ticket_info = search_ticket_info(attraction_name, city)
+        ticket_info = search_ticket_info(attraction_name, city, attraction_catalog)
         
         logger.info(f"Ticket info for {attraction_name}: {ticket_info}")
         return jsonify({'ticket_info': ticket_info})
@@ -741,6 +1765,29 @@ def get_ticket_info():
         return jsonify({'error': f'Failed to get ticket info: {str(e)}'}), 500
 
 
+@app.route('/api/ticket-info/batch', methods=['POST'])
+def get_ticket_info_batch():
+    """
+    Ticket information for every place of an itinerary in one request.
+    Takes {"city": ..., "places": [...]} where places are attraction names or
+    place objects with a "name" (e.g. itinerary.places); returns ticket_info
+    in the same order.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('places'), list):
+            return jsonify({'error': 'Please provide a list of places'}), 400
+        city = str(data.get('city') or '')
+
+        names = [str((place.get('name') if isinstance(place, dict) else place) or '')
+                 for place in data['places']]
+        return jsonify({'ticket_info': [search_ticket_info(name, city, attraction_catalog) for name in names]})
+
+    except Exception as e:
+        logger.error(f"Error getting ticket info: {str(e)}")
+        return jsonify({'error': f'Failed to get ticket info: {str(e)}'}), 500
+
+
 @app.route('/api/speech-to-text', methods=['POST'])
 def speech_to_text():
     """Convert speech audio to text"""
@@ -759,7 +1806,8 @@ def speech_to_text():
             temp_file_path = temp_file.name
 
         try:
-            # 初始化语音识别器
+            # 初始化语音识别器（首次使用时才导入 speech_recognition）
+            sr = providers.module('speech_recognition')
             recognizer = sr.Recognizer()
             
             # 读取音频文件
@@ -811,6 +1859,7 @@ def speech_to_text_offline():
             temp_file_path = temp_file.name
 
         try:
+            sr = providers.module('speech_recognition')
             recognizer = sr.Recognizer()
             
             with sr.AudioFile(temp_file_path) as source:
@@ -985,6 +2034,173 @@ def get_sample_itinerary(city, days):
     return sample_data
 
 
+def openweather_params(city, lat, lon):
+    """Query parameters locating a place for the OpenWeather API"""
+    params = {'appid': OPENWEATHER_API_KEY, 'units': 'metric'}
+    if lat is not None and lon is not None:
+        params.update(lat=lat, lon=lon)
+    else:
+        params['q'] = city
+    return params
+
+
+def parse_coordinates(lat, lon):
+    """
+    (lat, lon) as floats, or (None, None) if either is missing; raises
+    ValueError for non-numeric or out-of-range values
+    """
+    if lat in (None, '') or lon in (None, ''):
+        return None, None
+    if isinstance(lat, (bool, list, dict)) or isinstance(lon, (bool, list, dict)):
+        raise ValueError(f"Invalid coordinates: {lat!r}, {lon!r}")
+    lat, lon = float(lat), float(lon)
+    # NaN fails both comparisons
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Coordinates out of range: {lat}, {lon}")
+    return lat, lon
+
+
+def cached_weather(kind, city, lat, lon, fetch):
+    """Serve an OpenWeather response from weather_cache, sharing in-flight fetches"""
+    key = f"{kind}:{weather_location_key(city, lat, lon, WEATHER_GRID_DEGREES)}"
+    return weather_cache.get(key, lambda: weather_flight.do(key, fetch))
+
+
+def compact_forecast(forecast_data):
+    """Keep only the fields the weather routes use from a /forecast payload"""
+    return {
+        'city': {
+            'name': forecast_data.get('city', {}).get('name'),
+            'country': forecast_data.get('city', {}).get('country')
+        },
+        'list': [
+            {
+                'dt': forecast['dt'],
+                'dt_txt': forecast['dt_txt'],
+                'main': {
+                    'temp': forecast['main']['temp'],
+                    'feels_like': forecast['main']['feels_like'],
+                    'humidity': forecast['main']['humidity']
+                },
+                'weather': [{
+                    'description': forecast['weather'][0]['description'],
+                    'icon': forecast['weather'][0]['icon']
+                }],
+                'wind': {'speed': forecast['wind']['speed']}
+            }
+            for forecast in forecast_data.get('list', [])
+        ]
+    }
+
+
+def get_forecast_data(city, lat, lon):
+    """The (cached) OpenWeather 5-day / 3-hour forecast for a location"""
+    def fetch():
+        logger.info(f"🌤️ Getting weather forecast for: {city}")
+        response = openweather_http.get('/data/2.5/forecast', params=openweather_params(city, lat, lon))
+        response.raise_for_status()
+        return compact_forecast(response.json())
+
+    return cached_weather('forecast', city, lat, lon, fetch)
+
+
+def current_from_forecast(forecast_data):
+    """Current conditions from the forecast entry closest to now"""
+    forecast_list = forecast_data.get('list', [])
+    if not forecast_list:
+        raise ValueError('Forecast has no entries')
+    now = time.time()
+    forecast = min(forecast_list, key=lambda entry: abs(entry['dt'] - now))
+    return {
+        'temperature': forecast['main']['temp'],
+        'feels_like': forecast['main']['feels_like'],
+        'humidity': forecast['main']['humidity'],
+        'description': forecast['weather'][0]['description'],
+        'icon': forecast['weather'][0]['icon'],
+        'wind_speed': forecast['wind']['speed'],
+        'city': forecast_data['city']['name'],
+        'country': forecast_data['city']['country']
+    }
+
+
+def fetch_current_weather(city, lat, lon):
+    """Current conditions (derived from the cached forecast, or the Current Weather API)"""
+    if WEATHER_CURRENT_FROM_FORECAST:
+        return current_from_forecast(get_forecast_data(city, lat, lon))
+
+    def fetch():
+        logger.info(f"🌤️ Getting weather for: {city}")
+        response = openweather_http.get('/data/2.5/weather', params=openweather_params(city, lat, lon))
+        response.raise_for_status()
+
+        weather_data = response.json()
+
+        # Format weather information
+        weather_info = {
+            'temperature': weather_data['main']['temp'],
+            'feels_like': weather_data['main']['feels_like'],
+            'humidity': weather_data['main']['humidity'],
+            'description': weather_data['weather'][0]['description'],
+            'icon': weather_data['weather'][0]['icon'],
+            'wind_speed': weather_data['wind']['speed'],
+            'city': weather_data['name'],
+            'country': weather_data['sys']['country']
+        }
+
+        logger.info(f"✅ Weather data retrieved for {city}")
+        return weather_info
+
+    return cached_weather('current', city, lat, lon, fetch)
+
+
+def fetch_weather_forecast(city, lat, lon, days):
+    """One forecast entry per day from the (cached) 5-day forecast"""
+    forecast_data = get_forecast_data(city, lat, lon)
+
+    # Format forecast data for each day
+    daily_forecasts = []
+
+    # Group forecasts by day (first forecast for each day)
+    seen_dates = set()
+    forecast_list = forecast_data.get('list', [])
+
+    for forecast in forecast_list:
+        date_str = forecast['dt_txt'].split()[0]  # Extract date part
+        if date_str not in seen_dates and len(daily_forecasts) < days:
+            seen_dates.add(date_str)
+            daily_forecasts.append({
+                'date': date_str,
+                'temperature': forecast['main']['temp'],
+                'description': forecast['weather'][0]['description'],
+                'icon': forecast['weather'][0]['icon'],
+                'wind_speed': forecast['wind']['speed'],
+                'humidity': forecast['main']['humidity']
+            })
+
+    logger.info(f"✅ Weather forecast retrieved for {city}: {len(daily_forecasts)} days")
+    return daily_forecasts
+
+
+def find_events(city, country, date, days=1, country_code=None):
+    """
+    Events overlapping `days` days (clamped to 1..EVENTS_MAX_DAYS) from a
+    YYYY-MM-DD date (today if empty); raises ValueError on a bad date or days
+    """
+    if isinstance(days, bool) or not isinstance(days, (int, str)):
+        raise ValueError(f"Invalid number of days: {days!r}")
+    days = min(max(int(days), 1), EVENTS_MAX_DAYS)
+    if date:
+        start = datetime.strptime(date, '%Y-%m-%d').date()
+    else:
+        # Use current date if not provided
+        start = datetime.now().date()
+
+    events = event_store.query(city, country, start, days, country_code=country_code)
+
+    logger.info(f"🎉 Found {len(events)} events for {city} from {start} ({days} day(s))")
+    return events
+
+
 @app.route('/api/weather', methods=['POST'])
 def get_weather():
     """Get weather information for a location and date"""
@@ -994,39 +2210,20 @@ def get_weather():
         lat = data.get('lat', '')
         lon = data.get('lon', '')
         date = data.get('date', '')  # Date for future implementation with forecast API
+
+        try:
+            lat, lon = parse_coordinates(lat, lon)
+        except ValueError:
+            return jsonify({'error': 'Invalid coordinates. lat and lon must be numbers'}), 400
         
-        if not city and not (lat and lon):
+        if not city and lat is None:
             return jsonify({'error': 'Please provide city name or coordinates'}), 400
         
         if not OPENWEATHER_API_KEY:
             logger.warning("OpenWeather API key not configured")
             return jsonify({'error': 'Weather API not configured'}), 500
         
-        # Use OpenWeather Current Weather API
-        if lat and lon:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        else:
-            url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-        
-        logger.info(f"🌤️ Getting weather for: {city}")
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        weather_data = response.json()
-        
-        # Format weather information
-        weather_info = {
-            'temperature': weather_data['main']['temp'],
-            'feels_like': weather_data['main']['feels_like'],
-            'humidity': weather_data['main']['humidity'],
-            'description': weather_data['weather'][0]['description'],
-            'icon': weather_data['weather'][0]['icon'],
-            'wind_speed': weather_data['wind']['speed'],
-            'city': weather_data['name'],
-            'country': weather_data['sys']['country']
-        }
-        
-        logger.info(f"✅ Weather data retrieved for {city}")
+        weather_info = fetch_current_weather(city, lat, lon)
         return jsonify({'weather': weather_info}), 200
         
     except requests.exceptions.RequestException as e:
@@ -1046,47 +2243,20 @@ def get_weather_forecast():
         lat = data.get('lat', '')
         lon = data.get('lon', '')
         days = data.get('days', 3)
+
+        try:
+            lat, lon = parse_coordinates(lat, lon)
+        except ValueError:
+            return jsonify({'error': 'Invalid coordinates. lat and lon must be numbers'}), 400
         
-        if not city and not (lat and lon):
+        if not city and lat is None:
             return jsonify({'error': 'Please provide city name or coordinates'}), 400
         
         if not OPENWEATHER_API_KEY:
             logger.warning("OpenWeather API key not configured")
             return jsonify({'error': 'Weather API not configured'}), 500
         
-        # Use OpenWeather 5-day Forecast API
-        if lat and lon:
-            url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        else:
-            url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-        
-        logger.info(f"🌤️ Getting weather forecast for: {city}")
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        forecast_data = response.json()
-        
-        # Format forecast data for each day
-        daily_forecasts = []
-        
-        # Group forecasts by day (first forecast for each day)
-        seen_dates = set()
-        forecast_list = forecast_data.get('list', [])
-        
-        for forecast in forecast_list:
-            date_str = forecast['dt_txt'].split()[0]  # Extract date part
-            if date_str not in seen_dates and len(daily_forecasts) < days:
-                seen_dates.add(date_str)
-                daily_forecasts.append({
-                    'date': date_str,
-                    'temperature': forecast['main']['temp'],
-                    'description': forecast['weather'][0]['description'],
-                    'icon': forecast['weather'][0]['icon'],
-                    'wind_speed': forecast['wind']['speed'],
-                    'humidity': forecast['main']['humidity']
-                })
-        
-        logger.info(f"✅ Weather forecast retrieved for {city}: {len(daily_forecasts)} days")
+        daily_forecasts = fetch_weather_forecast(city, lat, lon, days)
         return jsonify({'forecast': daily_forecasts}), 200
         
     except requests.exceptions.RequestException as e:
@@ -1099,7 +2269,10 @@ def get_weather_forecast():
 
 @app.route('/api/events', methods=['POST'])
 def get_events():
-    """Get special events, festivals, and holidays for a location and date"""
+    """
+    Get special events, festivals, and holidays for a location, on a date or
+    (with "days") every event overlapping the trip from that date
+    """
     try:
         data = request.get_json()
         city = data.get('city', '')
@@ -1109,25 +2282,12 @@ def get_events():
         if not city:
             return jsonify({'error': 'Please provide city name'}), 400
         
-        # Parse date
-        from datetime import datetime
-        if date:
-            try:
-                event_date = datetime.strptime(date, '%Y-%m-%d')
-                month = event_date.month
-                day = event_date.day
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        else:
-            # Use current date if not provided
-            now = datetime.now()
-            month = now.month
-            day = now.day
-        
-        # Get events for the date
-        events = get_events_for_date(city, country, month, day)
+        try:
+            events = find_events(city, country, date, data.get('days', 1),
+                                 country_code=data.get('country_code'))
+        except (ValueError, OverflowError):
+            return jsonify({'error': 'Invalid date or days. Use YYYY-MM-DD and a number of days'}), 400
         
-        logger.info(f"🎉 Found {len(events)} events for {city} on {month}/{day}")
         return jsonify({'events': events}), 200
         
     except Exception as e:
@@ -1135,99 +2295,128 @@ def get_events():
         return jsonify({'error': 'Failed to get events'}), 500
 
 
-def get_events_for_date(city, country, month, day):
-    """Get events for a specific date"""
-    events = []
-    
-    # International holidays
-    international_holidays = {
-        (1, 1): "New Year's Day",
-        (2, 14): "Valentine's Day",
-        (3, 8): "International Women's Day",
-        (4, 1): "April Fools' Day",
-        (5, 1): "International Workers' Day",
-        (6, 1): "International Children's Day",
-        (10, 31): "Halloween",
-        (12, 25): "Christmas",
-        (12, 31): "New Year's Eve"
-    }
-    
-    # Chinese holidays (approximate dates)
-    chinese_holidays = {
-        (1, 1): "New Year's Day",
-        (2, 10): "Chinese New Year (Spring Festival)",  # Approximate
-        (3, 8): "Women's Day",
-        (4, 5): "Qingming Festival (Tomb Sweeping Day)",  # Approximate
-        (5, 1): "Labor Day",
-        (6, 1): "Children's Day",
-        (9, 10): "Teachers' Day",
-        (10, 1): "National Day"
-    }
-    
-    # Check for international holidays
-    if (month, day) in international_holidays:
-        events.append({
-            'name': international_holidays[(month, day)],
-            'type': 'holiday',
-            'description': f'International holiday: {international_holidays[(month, day)]}',
-            'impact': 'high'
-        })
-    
-    # Check for Chinese holidays if in China
-    if country and 'china' in country.lower():
-        if (month, day) in chinese_holidays:
-            events.append({
-                'name': chinese_holidays[(month, day)],
-                'type': 'holiday',
-                'description': f'Chinese holiday: {chinese_holidays[(month, day)]}',
-                'impact': 'high'
-            })
-    
-    # City-specific events
-    city_events = get_city_specific_events(city, month, day)
-    events.extend(city_events)
-    
-    return events
+def trip_context_sections(data):
+    """Weather / forecast / events lookups (name -> callable) for a trip-context request"""
+    city = data.get('city', '')
+    location_context = data.get('location_context') or {}
+    coordinates = location_context.get('coordinates') or {}
+    try:
+        lat, lon = parse_coordinates(coordinates.get('lat'), coordinates.get('lng'))
+    except ValueError:
+        # Bad coordinates only cost precision here: locate the weather by city name
+        lat, lon = None, None
+    start_date = data.get('start_date')
+
+    sections = {}
+    if OPENWEATHER_API_KEY:
+        if start_date:
+            sections['weather'] = lambda: fetch_current_weather(city, lat, lon)
+        sections['forecast'] = lambda: fetch_weather_forecast(city, lat, lon, int(data.get('days', 3)))
+    if start_date:
+        sections['events'] = lambda: find_events(
+            city, location_context.get('country', ''), start_date, int(data.get('days', 3)),
+            country_code=location_context.get('country_code'))
+    return sections
+
+
+def run_trip_section(name, fetch):
+    """Return the section payload; a failed section does not fail the trip"""
+    try:
+        return {name: fetch()}
+    except Exception as e:
+        logger.warning(f"Trip context: {name} failed: {str(e)}")
+        return {name: None, 'error': f'Failed to get {name}'}
 
 
-def get_city_specific_events(city, month, day):
-    """Get city-specific events (simplified database)"""
-    events = []
-    
-    # Major cities and their known events
-    city_events = {
-        'tokyo': {
-            (3, 20): {'name': 'Cherry Blossom Festival', 'type': 'festival', 'description': 'Tokyo cherry blossom season', 'impact': 'high'},
-            (7, 1): {'name': 'Summer Festival', 'type': 'festival', 'description': 'Traditional summer celebration', 'impact': 'medium'},
-            (12, 31): {'name': 'New Year Countdown', 'type': 'event', 'description': 'Shibuya New Year countdown event', 'impact': 'high'}
-        },
-        'paris': {
-            (7, 14): {'name': 'Bastille Day', 'type': 'holiday', 'description': 'French National Day', 'impact': 'high'},
-            (4, 1): {'name': 'April Fools Day', 'type': 'holiday', 'description': 'Traditional April Fools', 'impact': 'low'},
-            (12, 25): {'name': 'Christmas', 'type': 'holiday', 'description': 'Christmas celebration', 'impact': 'high'}
-        },
-        'london': {
-            (6, 2): {'name': "Queen's Birthday", 'type': 'holiday', 'description': 'UK Queen Birthday celebration', 'impact': 'medium'},
-            (11, 5): {'name': 'Bonfire Night', 'type': 'festival', 'description': 'Traditional bonfire festival', 'impact': 'medium'},
-            (12, 25): {'name': 'Christmas', 'type': 'holiday', 'description': 'Christmas celebration', 'impact': 'high'}
-        },
-        'new york': {
-            (7, 4): {'name': 'Independence Day', 'type': 'holiday', 'description': 'US Independence Day', 'impact': 'high'},
-            (11, 24): {'name': 'Thanksgiving', 'type': 'holiday', 'description': 'Thanksgiving celebration', 'impact': 'high'},
-            (12, 31): {'name': 'Times Square Countdown', 'type': 'event', 'description': 'New Year countdown event', 'impact': 'high'}
-        }
-    }
-    
-    # Check if city has specific events
-    city_lower = city.lower()
-    for city_name, events_dict in city_events.items():
-        if city_lower in city_name or city_name in city_lower:
-            if (month, day) in events_dict:
-                events.append(events_dict[(month, day)])
-    
-    return events
+@app.route('/api/trip-context', methods=['POST'])
+def get_trip_context():
+    """
+    Weather, forecast, events and itinerary for a confirmed place in one call.
+    Takes the /api/generate-itinerary body (plus start_date); the parts run
+    concurrently, so the response takes about as long as the slowest one.
+    """
+    data = request.get_json() or {}
+    if not data.get('city'):
+        return jsonify({'error': 'Please provide city name'}), 400
+
+    futures = {name: trip_context_executor.submit(run_trip_section, name, fetch)
+               for name, fetch in trip_context_sections(data).items()}
+
+    # The itinerary runs on this thread while the other sections are fetched
+    result = {'weather': None, 'forecast': None, 'events': []}
+    try:
+        for event, payload in stream_itinerary_events(data, get_client_id()):
+            if event in ('done', 'error'):
+                result.update(payload)
+    except Exception as e:
+        logger.error(f"Error generating trip itinerary: {str(e)}")
+        result['error'] = f'Failed to generate itinerary: {str(e)}'
+
+    errors = {}
+    for name, future in futures.items():
+        section = future.result()
+        result[name] = section[name]
+        if 'error' in section:
+            errors[name] = section['error']
+    if errors:
+        result['errors'] = errors
+    return jsonify(result), 500 if 'error' in result else 200
+
+
+@app.route('/api/trip-context/stream', methods=['POST'])
+def stream_trip_context():
+    """
+    Server-Sent Events variant of trip-context. `weather`, `forecast` and
+    `events` events are sent as each lookup finishes, interleaved with the
+    itinerary's `place` / `day` / `done` (or `error`) events.
+    """
+    data = request.get_json() or {}
+    if not data.get('city'):
+        return jsonify({'error': 'Please provide city name'}), 400
+
+    client_id = get_client_id()
+    sections = trip_context_sections(data)
+    events = queue.Queue()
+    finished = object()
+
+    def produce_section(name, fetch):
+        try:
+            events.put((name, run_trip_section(name, fetch)))
+        finally:
+            events.put(finished)
+
+    def produce_itinerary():
+        # Keeps running if the client disconnects, so the result still reaches the cache
+        try:
+            for event in stream_itinerary_events(data, client_id):
+                events.put(event)
+        except Exception as e:
+            logger.error(f"Error streaming trip itinerary: {str(e)}")
+            events.put(('error', {'error': f'Failed to generate itinerary: {str(e)}'}))
+        finally:
+            events.put(finished)
+
+    for name, fetch in sections.items():
+        trip_context_executor.submit(produce_section, name, fetch)
+    trip_context_executor.submit(produce_itinerary)
+
+    def generate():
+        remaining = len(sections) + 1
+        while remaining:
+            item = events.get()
+            if item is finished:
+                remaining -= 1
+                continue
+            yield sse_event(*item)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 if __name__ == '__main__':
     logger.info("Starting TripTeller Backend Server...")
+    audio_store.start_janitor(interval=AUDIO_JANITOR_INTERVAL)
     app.run(debug=True, host='0.0.0.0', port=5000)
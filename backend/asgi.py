@@ -0,0 +1,165 @@
+"""
+ASGI entrypoint: serves the Flask routes from an asyncio event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 2
+
+The routes and their JSON contracts are exactly those of app.py. The event
+loop owns the connections, reads request bodies and forwards response chunks;
+the route code runs on a large thread pool (ASGI_MAX_THREADS) while it waits on
+Gemini, ElevenLabs, Google or OpenWeather. A slow upstream call therefore holds
+one cheap pooled thread instead of a whole worker process, so one process
+serves hundreds of concurrent itinerary generations.
+
+Streaming responses (SSE itineraries, narration audio) are forwarded chunk by
+chunk and stop as soon as the client disconnects.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from app import AUDIO_JANITOR_INTERVAL, app, audio_store
+
+logger = logging.getLogger(__name__)
+
+ASGI_MAX_THREADS = int(os.getenv('ASGI_MAX_THREADS', '256'))
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope and request body into a WSGI environ"""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI carries the raw bytes of the path as latin-1 text
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class WSGIBridge:
+    """ASGI application running a WSGI app on a bounded thread pool"""
+
+    def __init__(self, wsgi_app, max_threads=ASGI_MAX_THREADS, on_startup=None):
+        self.wsgi_app = wsgi_app
+        self.max_threads = max_threads
+        # Per-process setup run at lifespan startup, i.e. in each server worker
+        self.on_startup = on_startup
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        with SpooledTemporaryFile(max_size=1024 * 1024) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            disconnected = threading.Event()
+
+            async def watch_disconnect():
+                while (await receive())['type'] != 'http.disconnect':
+                    pass
+                disconnected.set()
+
+            watcher = loop.create_task(watch_disconnect())
+            try:
+                await loop.run_in_executor(
+                    self.executor, self.run_wsgi, scope, body, send, loop, disconnected)
+            finally:
+                watcher.cancel()
+
+    def run_wsgi(self, scope, body, send, loop, disconnected):
+        """Run the WSGI app in a pool thread, sending its output through the event loop"""
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start = {}
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response_start.update(
+                type='http.response.start',
+                status=int(status.split(' ', 1)[0]),
+                headers=[(name.lower().encode('latin-1'), value.encode('latin-1'))
+                         for name, value in headers])
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if disconnected.is_set():
+                    # Closing the iterable lets generators (audio tees, playlists) clean up
+                    return
+                if not started:
+                    send_sync(response_start)
+                    started = True
+                if chunk:
+                    send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_sync(response_start)
+            send_sync({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.on_startup:
+                    self.on_startup()
+                logger.info(f"✅ ASGI bridge ready ({self.max_threads} request threads)")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+# Under gunicorn the janitor was already started in post_fork; start_janitor is then a no-op
+application = WSGIBridge(
+    app, on_startup=lambda: audio_store.start_janitor(interval=AUDIO_JANITOR_INTERVAL))
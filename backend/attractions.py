@@ -0,0 +1,200 @@
+"""
+Local attraction catalog for ticket information.
+
+Attractions (name, aliases, city, free/paid, price, booking URL) are loaded
+from a CSV file (data/attractions.csv) into an SQLite database with a
+character trigram inverted index per city. Lookups read the database
+through a memory-mapped, read-only connection, so every worker process
+shares the OS page cache instead of holding its own copy. LLM-produced
+names ("The Louvre (Musée du Louvre)") are matched fuzzily by the Dice
+coefficient of their trigram sets.
+"""
+
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from gazetteer import normalize_name
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = '1'
+
+
+def trigrams(name):
+    """Set of character trigrams of a normalized name (padded at word boundaries)"""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def city_key(city):
+    """Catalog key for a city: "Paris, France" and "paris" are the same city"""
+    return normalize_name((city or '').split(',')[0])
+
+
+def name_variants(name):
+    """The name, plus its parts outside and inside parentheses"""
+    variants = [name]
+    outside = re.sub(r'\([^)]*\)', ' ', name)
+    if outside != name:
+        variants.append(outside)
+        variants.extend(re.findall(r'\(([^)]*)\)', name))
+    return [key for key in dict.fromkeys(normalize_name(v) for v in variants) if key]
+
+
+class AttractionCatalog:
+    """
+    Usage:
+        catalog = AttractionCatalog.open('data/attractions.csv', 'cache/attractions.sqlite3')
+        catalog.lookup('The Louvre', 'Paris')  # -> attraction dict or None
+    """
+
+    def __init__(self, db_path, min_score=0.6, mmap_size=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.min_score = min_score
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+
+    @classmethod
+    def open(cls, csv_path, db_path, **kwargs):
+        """Open the catalog, (re)building the database if the CSV changed"""
+        if cls._needs_build(csv_path, db_path):
+            cls.build(csv_path, db_path)
+        return cls(db_path, **kwargs)
+
+    @staticmethod
+    def _source_signature(csv_path):
+        stat = os.stat(csv_path)
+        return f"{SCHEMA_VERSION}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    @classmethod
+    def _needs_build(cls, csv_path, db_path):
+        if not os.path.exists(db_path):
+            return True
+        try:
+            with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        except sqlite3.Error:
+            return True
+        return row is None or row[0] != cls._source_signature(csv_path)
+
+    @classmethod
+    def build(cls, csv_path, db_path):
+        """Build the database from the CSV file (written to a temp file, then swapped in)"""
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        tmp_path = f"{db_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript("""
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE attractions (
+                    id INTEGER PRIMARY KEY, name TEXT, city TEXT, country_code TEXT,
+                    requires_ticket INTEGER, price TEXT, booking_url TEXT
+                );
+                CREATE TABLE variants (
+                    id INTEGER PRIMARY KEY, attraction_id INTEGER, gram_count INTEGER
+                );
+                CREATE TABLE grams (
+                    city TEXT, gram TEXT, variant_id INTEGER,
+                    PRIMARY KEY (city, gram, variant_id)
+                ) WITHOUT ROWID;
+            """)
+            count = 0
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    cursor = conn.execute(
+                        "INSERT INTO attractions (name, city, country_code, requires_ticket, price, booking_url) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (row['name'], row['city'], row['country_code'].upper(),
+                         int(row['requires_ticket'].strip().lower() == 'true'),
+                         row['price'] or None, row['booking_url'] or None))
+                    attraction_id = cursor.lastrowid
+                    key = city_key(row['city'])
+                    names = [row['name']] + [alias for alias in row['aliases'].split('|') if alias]
+                    for variant in dict.fromkeys(normalize_name(name) for name in names):
+                        if not variant:
+                            continue
+                        grams = trigrams(variant)
+                        variant_id = conn.execute(
+                            "INSERT INTO variants (attraction_id, gram_count) VALUES (?, ?)",
+                            (attraction_id, len(grams))).lastrowid
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO grams (city, gram, variant_id) VALUES (?, ?, ?)",
+                            [(key, gram, variant_id) for gram in grams])
+                    count += 1
+            conn.execute("INSERT INTO meta (key, value) VALUES ('source', ?)",
+                         (cls._source_signature(csv_path),))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+        logger.info(f"🎟️ Attraction catalog built: {count} attractions from {csv_path}")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, name, city):
+        """Best-matching attraction in city as a dict (with 'score'), or None"""
+        key = city_key(city)
+        variants = name_variants(name or '')
+        if not key or not variants:
+            return None
+
+        conn = self._connection()
+        best = None
+        for variant in variants:
+            grams = trigrams(variant)
+            placeholders = ','.join('?' * len(grams))
+            rows = conn.execute(
+                f"SELECT v.attraction_id, v.gram_count, COUNT(*) FROM grams g "
+                f"JOIN variants v ON v.id = g.variant_id "
+                f"WHERE g.city = ? AND g.gram IN ({placeholders}) GROUP BY g.variant_id",
+                (key, *grams)).fetchall()
+            for attraction_id, gram_count, shared in rows:
+                score = 2 * shared / (len(grams) + gram_count)
+                if best is None or score > best[0]:
+                    best = (score, attraction_id)
+
+        with self._lock:
+            self.lookups += 1
+        if best is None or best[0] < self.min_score:
+            return None
+
+        row = conn.execute(
+            "SELECT name, city, country_code, requires_ticket, price, booking_url "
+            "FROM attractions WHERE id = ?", (best[1],)).fetchone()
+        with self._lock:
+            self.matches += 1
+        return {
+            'name': row[0],
+            'city': row[1],
+            'country_code': row[2],
+            'requires_ticket': bool(row[3]),
+            'price': row[4],
+            'booking_url': row[5],
+            'score': round(best[0], 3)
+        }
+
+    def stats(self):
+        conn = self._connection()
+        with self._lock:
+            return {
+                'attractions': conn.execute("SELECT COUNT(*) FROM attractions").fetchone()[0],
+                'lookups': self.lookups,
+                'matches': self.matches,
+                'min_score': self.min_score
+            }
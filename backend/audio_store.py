@@ -0,0 +1,206 @@
+"""
+Disk-quota-managed store for the temp_audio folder.
+
+Keeps an index of every MP3 in the folder with its size and last access
+time. When the folder grows past `max_bytes` the least recently played
+files are evicted, files not played for `max_age` seconds expire, and a
+background janitor thread also removes partial writes left behind by
+crashed or interrupted syntheses.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = '.part'
+
+
+class AudioStore:
+    def __init__(self, folder, max_bytes=500 * 1024 * 1024, max_age=30 * 24 * 3600,
+                 partial_max_age=3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.partial_max_age = partial_max_age
+        # filename -> [size, last_access]
+        self._index = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._janitor = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.orphans_removed = 0
+        os.makedirs(folder, exist_ok=True)
+        self.rescan()
+        self.enforce_quota()
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def rescan(self):
+        """Rebuild the index from the folder (access time = max(atime, mtime))"""
+        index = {}
+        total = 0
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not is_audio_name(entry.name):
+                continue
+            st = entry.stat()
+            index[entry.name] = [st.st_size, max(st.st_atime, st.st_mtime)]
+            total += st.st_size
+        with self._lock:
+            self._index = index
+            self._bytes = total
+
+    def contains(self, filename):
+        """True if filename is resident (does not count as a hit or miss)"""
+        with self._lock:
+            indexed = filename in self._index
+        if not is_audio_name(filename) or not os.path.isfile(self.path(filename)):
+            if indexed:
+                # Evicted by another worker process
+                self._forget(filename)
+            return False
+        if not indexed:
+            # Written by another worker process
+            self.add(filename)
+        return True
+
+    def record_lookup(self, hit):
+        """Count a client request answered from the store (hit) or not (miss)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def touch(self, filename):
+        """Record that filename was played"""
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(filename)
+            if entry is None:
+                return
+            entry[1] = now
+        try:
+            # Persist the access time without changing mtime (Last-Modified)
+            st = os.stat(self.path(filename))
+            os.utime(self.path(filename), (now, st.st_mtime))
+        except OSError:
+            pass
+
+    def add(self, filename):
+        """Register a newly written file and enforce the quota"""
+        try:
+            size = os.path.getsize(self.path(filename))
+        except OSError:
+            return
+        with self._lock:
+            old = self._index.get(filename)
+            if old:
+                self._bytes -= old[0]
+            self._index[filename] = [size, time.time()]
+            self._bytes += size
+        self.enforce_quota(keep=filename)
+
+    def _forget(self, filename):
+        with self._lock:
+            entry = self._index.pop(filename, None)
+            if entry:
+                self._bytes -= entry[0]
+
+    def _remove(self, filename):
+        self._forget(filename)
+        try:
+            os.unlink(self.path(filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove audio file {filename}: {e}")
+
+    def enforce_quota(self, keep=None):
+        """Evict least recently played files until under max_bytes"""
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return 0
+            by_access = sorted(self._index.items(), key=lambda item: item[1][1])
+            victims = []
+            remaining = self._bytes
+            for filename, (size, _) in by_access:
+                if remaining <= self.max_bytes:
+                    break
+                if filename == keep:
+                    continue
+                victims.append(filename)
+                remaining -= size
+            self.evictions += len(victims)
+        for filename in victims:
+            self._remove(filename)
+        if victims:
+            logger.info(f"🧹 Evicted {len(victims)} audio file(s) to stay under quota")
+        return len(victims)
+
+    def sweep(self):
+        """Expire old files, remove orphaned partial writes and enforce the quota"""
+        now = time.time()
+        with self._lock:
+            expired = [name for name, (_, accessed) in self._index.items()
+                       if now - accessed > self.max_age]
+            self.expired += len(expired)
+        for filename in expired:
+            self._remove(filename)
+
+        orphans = 0
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.endswith(PARTIAL_SUFFIX):
+                try:
+                    if now - entry.stat().st_mtime > self.partial_max_age:
+                        os.unlink(entry.path)
+                        orphans += 1
+                except OSError:
+                    pass
+        with self._lock:
+            self.orphans_removed += orphans
+
+        self.rescan()
+        self.enforce_quota()
+
+    def start_janitor(self, interval=300):
+        """Run sweep() every `interval` seconds in a daemon thread"""
+        # A janitor inherited through fork() is not running in this process
+        if self._janitor is not None and self._janitor.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Audio janitor error: {e}")
+
+        self._janitor = threading.Thread(target=run, name='audio-janitor', daemon=True)
+        self._janitor.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._index),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'orphans_removed': self.orphans_removed
+            }
+
+
+def is_audio_name(filename):
+    """Finished clips only: *.mp3, not hidden temp files (.name.part) being written"""
+    return filename.endswith('.mp3') and not filename.startswith('.')
@@ -0,0 +1,84 @@
+"""
+Import-time budget for the backend (cold start of every worker process).
+
+    python bench_import.py                 # best of 5 runs, default budget
+    python bench_import.py --budget-ms 300
+
+Runs `python -X importtime -c "import app"` with every provider key set,
+then fails (exit code 1) if importing app took longer than the budget or if
+any provider SDK / heavy optional module was imported at startup; those
+must stay lazy (see providers.py).
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Must only be imported on first use, never by `import app`
+LAZY_MODULES = [
+    'google.genai',
+    'cerebras.cloud.sdk',
+    'elevenlabs',
+    'speech_recognition',
+    'pocketsphinx',
+]
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def measure():
+    """
+    Return {module: cumulative import time in microseconds} for one cold
+    `import app`; the 'app' entry is the total time of the import
+    """
+    env = dict(os.environ)
+    for key in ('GEMINI_API_KEY', 'CEREBRAS_API_KEY', 'OPENROUTER_API_KEY', 'ELEVENLABS_API_KEY',
+                'GOOGLE_MAPS_API_KEY', 'OPENWEATHER_API_KEY'):
+        env.setdefault(key, 'import-time-benchmark')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import-time budget of app.py')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.getenv('IMPORT_BUDGET_MS', '450')))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best = min(runs, key=lambda run: run.get('app', 0))
+    total_ms = best['app'] / 1000
+
+    print(f"import app: {total_ms:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print('slowest imports:')
+    for name, us in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:11]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if any(name in run for run in runs)]
+    if eager:
+        failures.append(f"imported at startup (must be lazy): {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print('✅ within budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark the dev server against the production launchers.
+
+    python bench_server.py --mode dev
+    python bench_server.py --mode gunicorn
+    python bench_server.py --mode uvicorn
+
+Starts the server on --port, measures the time until /api/health answers
+(cold start), fires --requests requests at --path with --concurrency client
+threads, then stops the server with SIGTERM and measures the shutdown.
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    'dev': lambda port: [sys.executable, '-c',
+                         f"import app; app.app.run(debug=True, host='127.0.0.1', port={port})"],
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                              '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null'],
+    'uvicorn': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:application',
+                             '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+}
+
+
+def wait_ready(base_url, timeout=60):
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=1).status_code == 200:
+                return time.time() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError('Server did not become ready')
+
+
+def run_load(url, total, concurrency):
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=30).status_code < 500
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'rps': total / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': sum(1 for _, ok in results if not ok)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=sorted(COMMANDS), default='gunicorn')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--path', default='/api/health')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen(COMMANDS[args.mode](args.port), cwd=HERE,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    try:
+        ready = wait_ready(base_url)
+        run_load(base_url + args.path, min(100, args.requests), args.concurrency)  # warm up
+        result = run_load(base_url + args.path, args.requests, args.concurrency)
+    finally:
+        stop_start = time.time()
+        os.killpg(server.pid, signal.SIGTERM)
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+        stopped = time.time() - stop_start
+
+    print(f"{args.mode:9s} ready {ready:5.2f}s | {result['rps']:7.1f} req/s | "
+          f"p50 {result['p50_ms']:6.1f} ms | p95 {result['p95_ms']:6.1f} ms | "
+          f"errors {result['errors']} | shutdown {stopped:4.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+In-process TTL + LRU cache with an optional SQLite tier.
+
+Used to keep the results of slow upstream calls (LLM itineraries and other
+API responses) so repeat requests can skip the network entirely.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def make_fingerprint(*parts):
+    """Build a stable sha256 key from JSON-serializable parts"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    When `db_path` is given, entries are also written to a SQLite table so
+    they survive restarts; memory misses fall through to disk and are
+    promoted back into memory on a hit.
+    """
+
+    def __init__(self, name, max_entries=256, ttl=3600, db_path=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                with self._connect() as conn:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS cache_entries ('
+                        ' namespace TEXT NOT NULL,'
+                        ' key TEXT NOT NULL,'
+                        ' value TEXT NOT NULL,'
+                        ' expires_at REAL NOT NULL,'
+                        ' PRIMARY KEY (namespace, key))'
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Disabling SQLite tier for cache '{name}': {e}")
+                self.db_path = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, key):
+        """Return the cached value or None if missing/expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value[0], value[1])
+        return value[0]
+
+    def set(self, key, value, ttl=None):
+        """Store a JSON-serializable value"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+        self._disk_set(key, value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                        (self.name, key))
+            except sqlite3.Error as e:
+                logger.warning(f"Cache '{self.name}' disk delete failed: {e}")
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key, now):
+        if not self.db_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+                    (self.name, key)).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    conn.execute(
+                        'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                        (self.name, key))
+                    return None
+                return json.loads(row[0]), row[1]
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Cache '{self.name}' disk read failed: {e}")
+            return None
+
+    def _disk_set(self, key, value, expires_at):
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (self.name, key, json.dumps(value, ensure_ascii=False), expires_at))
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"Cache '{self.name}' disk write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'persistent': bool(self.db_path),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
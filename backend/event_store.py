@@ -0,0 +1,161 @@
+"""
+Holidays, festivals and city events loaded from data/events.json.
+
+Each event is global, for a country or for a list of cities, and has a date
+rule: a fixed month/day, the nth weekday of a month, an offset from Easter,
+or a per-year table for lunar and other moveable dates (with an optional
+month/day fallback). Events can span several days. Occurrences are computed
+once per year and kept sorted by start date per scope, so a range query
+over a whole trip is a few binary searches.
+"""
+
+import bisect
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+
+from gazetteer import normalize_name
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, nth):
+    """nth (1-based, -1 = last) weekday of a month"""
+    if nth > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (nth - 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7 + 7 * (-nth - 1))
+
+
+def event_start(rule, year):
+    """Start date of a date rule in a year, or None if it has no date that year"""
+    if str(year) in rule.get('dates', {}):
+        month, day = rule['dates'][str(year)].split('-')
+        return date(year, int(month), int(day))
+    if 'easter' in rule:
+        return easter_sunday(year) + timedelta(days=rule['easter'])
+    if 'weekday' in rule:
+        return nth_weekday(year, rule['month'], WEEKDAYS.index(rule['weekday']), rule['nth'])
+    if 'month' in rule:
+        return date(year, rule['month'], rule['day'])
+    return None
+
+
+class EventStore:
+    """
+    Usage:
+        store = EventStore.from_json('data/events.json')
+        store.query('Tokyo', 'Japan', date(2025, 3, 28), days=5)
+    """
+
+    def __init__(self, events, countries=None):
+        self.events = list(events)
+        # Country names / codes -> country code
+        self._countries = {}
+        for code, names in (countries or {}).items():
+            for name in [code, *names]:
+                self._countries[normalize_name(name)] = code.upper()
+        self._max_days = max((event.get('days', 1) for event in self.events), default=1)
+        self._years = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        logger.info(f"🎉 Event store loaded {len(data['events'])} events from {path}")
+        return cls(data['events'], data.get('countries'))
+
+    @staticmethod
+    def _scopes(event):
+        if event.get('cities'):
+            return [('city', normalize_name(city)) for city in event['cities']]
+        if event.get('country'):
+            return [('country', event['country'].upper())]
+        return [('global', None)]
+
+    def _year_index(self, year):
+        """{scope: (sorted start dates, [(start, end, event)])} for one year, built once"""
+        index = self._years.get(year)
+        if index is not None:
+            return index
+
+        occurrences = defaultdict(list)
+        for event in self.events:
+            start = event_start(event['date'], year)
+            if start is None:
+                continue
+            end = start + timedelta(days=event.get('days', 1) - 1)
+            for scope in dict.fromkeys(self._scopes(event)):
+                occurrences[scope].append((start, end, event))
+
+        index = {}
+        for scope, entries in occurrences.items():
+            entries.sort(key=lambda entry: entry[0])
+            index[scope] = ([entry[0] for entry in entries], entries)
+        with self._lock:
+            self._years[year] = index
+        return index
+
+    def country_code(self, country):
+        return self._countries.get(normalize_name(country or ''))
+
+    def query(self, city, country, start, days=1, country_code=None):
+        """Events overlapping start .. start + days - 1, ordered by start date"""
+        end = start + timedelta(days=max(int(days), 1) - 1)
+        code = (country_code or '').upper() or self.country_code(country)
+        scopes = [('global', None), ('city', normalize_name((city or '').split(',')[0]))]
+        if code:
+            scopes.insert(1, ('country', code))
+
+        results = []
+        # An event that started up to max_days earlier (possibly last year) may still overlap
+        earliest = start - timedelta(days=self._max_days - 1)
+        for year in range(earliest.year, end.year + 1):
+            index = self._year_index(year)
+            for scope in scopes:
+                if scope not in index:
+                    continue
+                starts, entries = index[scope]
+                lo = bisect.bisect_left(starts, earliest)
+                hi = bisect.bisect_right(starts, end)
+                results.extend(entry for entry in entries[lo:hi] if entry[1] >= start)
+
+        # The same event at several levels (e.g. Thanksgiving for the US and for
+        # New York) is listed once, with the most specific description
+        unique = {}
+        for entry in results:
+            unique[(entry[2]['name'], entry[0])] = entry
+        results = sorted(unique.values(), key=lambda entry: entry[0])
+        return [
+            {
+                'name': event['name'],
+                'type': event['type'],
+                'description': event['description'],
+                'impact': event['impact'],
+                'start_date': event_start_date.isoformat(),
+                'end_date': event_end_date.isoformat()
+            }
+            for event_start_date, event_end_date, event in results
+        ]
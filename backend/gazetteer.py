@@ -0,0 +1,177 @@
+"""
+Offline city gazetteer for place search and autocomplete.
+
+Cities are loaded from a CSV file (data/cities.csv: name, alternate names,
+admin1, country, coordinates, population) into a sorted array of normalized
+names, so exact and prefix lookups are a binary search instead of a Google
+call. Matches are ranked by population; a query can be narrowed with a
+state/province or country ("Paris, TX", "Paris France", "London, ON").
+"""
+
+import bisect
+import csv
+import logging
+import re
+import unicodedata
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+City = namedtuple('City', [
+    'name', 'admin1', 'admin1_code', 'country_code', 'country',
+    'latitude', 'longitude', 'population'
+])
+
+
+_DROPPED = re.compile(r"[.'’]")
+_SEPARATORS = re.compile(r'[\W_]+')
+# The same two rules as one str.translate table, for the (common) ASCII names
+_ASCII_TABLE = {
+    code: None if chr(code) in ".'" else ' '
+    for code in range(128) if not chr(code).isalnum()
+}
+
+
+def normalize_name(text):
+    """Search key for a name: accents, case and punctuation do not matter"""
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+        if not text.isascii():
+            return ' '.join(_SEPARATORS.sub(' ', _DROPPED.sub('', text)).split())
+    return ' '.join(text.lower().translate(_ASCII_TABLE).split())
+
+
+class Gazetteer:
+    """
+    Usage:
+        gazetteer = Gazetteer.from_csv('data/cities.csv')
+        gazetteer.search('Paris, TX')       # exact city name (+ qualifier)
+        gazetteer.autocomplete('par', 8)    # name prefix
+    """
+
+    def __init__(self, cities, alternate_names=None):
+        self.cities = list(cities)
+        alternate_names = alternate_names or [[] for _ in self.cities]
+        entries = set()
+        self._place_ids = {}
+        for index, (city, names) in enumerate(zip(self.cities, alternate_names)):
+            keys = [normalize_name(name) for name in [city.name, *names]]
+            entries.update((key, index) for key in keys if key)
+            self._place_ids[city_place_id(city, keys[0])] = index
+        # Parallel sorted arrays: every (normalized name, city index) pair
+        ordered = sorted(entries)
+        self._keys = [key for key, _ in ordered]
+        self._ids = [index for _, index in ordered]
+        # Qualifiers a query may end with, per city: admin1 name/code, country name/code.
+        # Thousands of cities share a few hundred of these, so each set is built once
+        qualifiers = {}
+        self._qualifiers = []
+        for city in self.cities:
+            values = (city.admin1, city.admin1_code, city.country, city.country_code)
+            if values not in qualifiers:
+                qualifiers[values] = frozenset(normalize_name(value) for value in values if value)
+            self._qualifiers.append(qualifiers[values])
+
+    @classmethod
+    def from_csv(cls, path):
+        cities = []
+        alternates = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                cities.append(City(
+                    name=row['name'],
+                    admin1=row['admin1'],
+                    admin1_code=row['admin1_code'],
+                    country_code=row['country_code'].upper(),
+                    country=row['country'],
+                    latitude=float(row['latitude']),
+                    longitude=float(row['longitude']),
+                    population=int(row['population'] or 0)
+                ))
+                alternates.append([name for name in row['alternate_names'].split('|') if name])
+        logger.info(f"🗺️ Gazetteer loaded {len(cities)} cities from {path}")
+        return cls(cities, alternates)
+
+    def __len__(self):
+        return len(self.cities)
+
+    def get(self, place_id):
+        """City for a place_id from place_from_city, or None"""
+        index = self._place_ids.get(place_id)
+        return self.cities[index] if index is not None else None
+
+    def _exact(self, key):
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key)
+        return set(self._ids[start:end])
+
+    def _prefix(self, prefix):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\uffff')
+        return set(self._ids[start:end])
+
+    def _qualified(self, indexes, qualifier, prefix=False):
+        if not qualifier:
+            return indexes
+        return {
+            index for index in indexes
+            if any(value == qualifier or (prefix and value.startswith(qualifier))
+                   for value in self._qualifiers[index])
+        }
+
+    def _ranked(self, indexes, limit):
+        ranked = sorted(indexes, key=lambda index: (-self.cities[index].population, index))
+        return [self.cities[index] for index in ranked[:limit]]
+
+    def search(self, query, limit=5):
+        """Cities whose name (or alternate name) is exactly the query, largest first"""
+        name, _, qualifier = query.partition(',')
+        key = normalize_name(name)
+        qualifier = normalize_name(qualifier)
+        matches = self._qualified(self._exact(key), qualifier)
+
+        # "Paris TX" / "Cambridge United Kingdom": trailing words as the qualifier
+        words = key.split()
+        if not matches and not qualifier:
+            for split in range(len(words) - 1, 0, -1):
+                matches = self._qualified(
+                    self._exact(' '.join(words[:split])), ' '.join(words[split:]))
+                if matches:
+                    break
+        return self._ranked(matches, limit)
+
+    def autocomplete(self, prefix, limit=8):
+        """Cities whose name starts with prefix, largest first"""
+        name, comma, qualifier = prefix.partition(',')
+        key = normalize_name(name)
+        if not key:
+            return []
+        if comma:
+            # The name is complete once a comma was typed; complete the qualifier
+            return self._ranked(
+                self._qualified(self._exact(key), normalize_name(qualifier), prefix=True), limit)
+        return self._ranked(self._prefix(key), limit)
+
+
+def city_place_id(city, name_key=None):
+    """Stable place_id for a gazetteer city, e.g. gazetteer:us:tx:paris"""
+    if name_key is None:
+        name_key = normalize_name(city.name)
+    parts = [normalize_name(part) for part in (city.country_code, city.admin1_code) if part]
+    return 'gazetteer:' + ':'.join(part.replace(' ', '-') for part in [*parts, name_key] if part)
+
+
+def place_from_city(city):
+    """place_info dict (same shape as a parsed Geocoding result) for a gazetteer city"""
+    parts = [city.name, city.admin1 if city.admin1 != city.name else None, city.country]
+    return {
+        'formatted_address': ', '.join(part for part in parts if part),
+        'place_id': city_place_id(city),
+        'location': {'lat': city.latitude, 'lng': city.longitude},
+        'city': city.name,
+        'state': city.admin1 or None,
+        'country': city.country,
+        'country_code': city.country_code,
+        'population': city.population
+    }
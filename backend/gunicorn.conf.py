@@ -0,0 +1,49 @@
+"""
+Production launcher configuration.
+
+    cd backend && gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and forked into the
+workers; each worker then builds its own provider clients and connection
+pools in post_fork (sockets and threads must not be shared across a fork).
+Upstream calls are I/O bound, so the default worker class is gthread with
+many threads per worker. GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+serves the ASGI path (asgi:application) instead.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+wsgi_app = os.getenv(
+    'GUNICORN_APP',
+    'asgi:application' if worker_class.startswith('uvicorn') else 'app:app')
+
+preload_app = True
+
+# LLM generations can take a minute; workers get graceful_timeout to finish
+# in-flight requests (SIGTERM) before they are killed
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    import app
+    app.init_worker()
+    server.log.info(f"Worker {worker.pid} ready (clients and connection pools initialized)")
+
+
+def worker_exit(server, worker):
+    server.log.info(f"Worker {worker.pid} exited")
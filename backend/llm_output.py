@@ -0,0 +1,376 @@
+"""
+Structured output for the itinerary prompts.
+
+Each prompt kind (whole itinerary, outline, single day) has a JSON schema
+that is sent to the provider as its structured-output / JSON mode, and a
+pydantic model (built once at import) that validates the response.
+parse_structured() parses with json.loads first; output that is only
+near-valid JSON (```json fences, prose around the object, trailing commas,
+comments, single quotes, Python literals, raw newlines in strings, a
+response cut off mid-object) is repaired instead of being thrown away.
+Parse and validation times are recorded in OutputStats.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class _Lenient(BaseModel):
+    # Keep fields the prompt did not ask for; accept 3 for "3" and "true" for true
+    model_config = ConfigDict(extra='allow', coerce_numbers_to_str=True)
+
+
+class TicketInfo(_Lenient):
+    requires_ticket: bool = False
+    ticket_price: Optional[str] = None
+    booking_url: Optional[str] = None
+    source: str = 'AI Generated'
+    notes: Optional[str] = None
+
+
+class Place(_Lenient):
+    name: str
+    description: str = ''
+    duration: str = ''
+    category: str = ''
+    ticket_info: Optional[TicketInfo] = None
+
+
+class Day(_Lenient):
+    day: int = 0
+    places: List[Place] = []
+
+
+class Itinerary(_Lenient):
+    city: str = ''
+    days: int = 0
+    schedule: List[Day]
+    tips: List[str] = []
+
+
+class OutlineDay(_Lenient):
+    day: int = 0
+    theme: str = ''
+    area: str = ''
+
+
+class Outline(_Lenient):
+    outline: List[OutlineDay]
+    tips: List[str] = []
+
+
+# JSON schemas sent to the providers. Only the subset every provider accepts
+# (type / properties / required / items), so one schema serves all of them.
+TICKET_INFO_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'requires_ticket': {'type': 'boolean'},
+        'ticket_price': {'type': 'string'},
+        'booking_url': {'type': 'string'},
+        'source': {'type': 'string'},
+        'notes': {'type': 'string'}
+    },
+    'required': ['requires_ticket', 'ticket_price']
+}
+
+PLACE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string'},
+        'description': {'type': 'string'},
+        'duration': {'type': 'string'},
+        'category': {'type': 'string'},
+        'ticket_info': TICKET_INFO_SCHEMA
+    },
+    'required': ['name', 'description', 'duration', 'category', 'ticket_info']
+}
+
+DAY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'day': {'type': 'integer'},
+        'places': {'type': 'array', 'items': PLACE_SCHEMA}
+    },
+    'required': ['day', 'places']
+}
+
+ITINERARY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'city': {'type': 'string'},
+        'days': {'type': 'integer'},
+        'schedule': {'type': 'array', 'items': DAY_SCHEMA},
+        'tips': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['city', 'days', 'schedule', 'tips']
+}
+
+OUTLINE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'outline': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'day': {'type': 'integer'},
+                    'theme': {'type': 'string'},
+                    'area': {'type': 'string'}
+                },
+                'required': ['day', 'theme', 'area']
+            }
+        },
+        'tips': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['outline', 'tips']
+}
+
+
+class OutputFormat:
+    """A prompt kind: the schema sent to the provider and the model that validates the reply"""
+
+    def __init__(self, name, schema, model):
+        self.name = name
+        self.schema = schema
+        self.model = model
+
+
+ITINERARY_FORMAT = OutputFormat('itinerary', ITINERARY_SCHEMA, Itinerary)
+DAY_FORMAT = OutputFormat('itinerary_day', DAY_SCHEMA, Day)
+OUTLINE_FORMAT = OutputFormat('itinerary_outline', OUTLINE_SCHEMA, Outline)
+
+
+def gemini_schema(schema):
+    """
+    Copy of a schema for Gemini's response_schema: properties are generated
+    in alphabetical order unless property_ordering says otherwise, and the
+    prompt order (name before description, schedule before tips) matters
+    for streaming
+    """
+    if not isinstance(schema, dict):
+        return schema
+    converted = {}
+    for key, value in schema.items():
+        if key == 'properties':
+            converted[key] = {name: gemini_schema(prop) for name, prop in value.items()}
+            converted['property_ordering'] = list(value)
+        elif key == 'items':
+            converted[key] = gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+def openai_response_format(output_format):
+    """response_format for OpenAI-compatible chat APIs (Cerebras, OpenRouter)"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': output_format.name,
+            # Strict mode would require additionalProperties: false everywhere
+            'strict': False,
+            'schema': output_format.schema
+        }
+    }
+
+
+_PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def repair_json(text):
+    """
+    Best-effort JSON text for near-valid model output. The first object or
+    array in text is rewritten as strict JSON; if the output stops before
+    the root is closed, it is cut back to the last complete member and the
+    open containers are closed. Returns None if there is no object.
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    if start < 0:
+        return None
+
+    out = []
+    stack = []
+    # (len(out), len(stack)) right after the last complete member of a container
+    safe = None
+    quote = None
+    escape = False
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'":
+                    # \' is not a JSON escape
+                    out[-1] = ch
+                else:
+                    out.append(ch)
+            elif ch == '\\':
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                # A double quote inside a single-quoted string
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            elif ch == '\r':
+                out.append('\\r')
+            elif ch == '\t':
+                out.append('\\t')
+            elif ch < ' ':
+                out.append(f'\\u{ord(ch):04x}')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in '"\'':
+            quote = ch
+            out.append('"')
+        elif ch in '{[':
+            stack.append(ch)
+            out.append(ch)
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            # A mismatched bracket closes the innermost open container
+            out.append(_CLOSERS[stack.pop()] if stack else ch)
+            if not stack:
+                return ''.join(out)
+            safe = (len(out), len(stack))
+        elif ch == ',':
+            safe = (len(out), len(stack))
+            out.append(ch)
+        elif ch == '/' and text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        elif ch == '/' and text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        elif ch.isalpha() or ch == '_':
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            word = text[i:j]
+            if word in _PYTHON_LITERALS:
+                word = _PYTHON_LITERALS[word]
+            elif text[j:j + 1] == ':' or text[j:].lstrip().startswith(':'):
+                # Unquoted object key
+                word = f'"{word}"'
+            out.append(word)
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # The root was never closed: the response was cut off. Drop the member
+    # that was being written rather than keep half a name or URL
+    if safe is not None:
+        length, depth = safe
+        return _close(out[:length], stack[:depth])
+    if escape:
+        out.pop()
+    if quote:
+        out.append('"')
+    return _close(out, stack)
+
+
+def _strip_trailing_comma(out):
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ',':
+        del out[j]
+
+
+def _close(out, stack):
+    while out and (out[-1].isspace() or out[-1] in ',:'):
+        out.pop()
+    for opener in reversed(stack):
+        _strip_trailing_comma(out)
+        out.append(_CLOSERS[opener])
+    return ''.join(out)
+
+
+class OutputStats:
+    """How model output was parsed, and how long parsing and validation took"""
+
+    def __init__(self):
+        self.strict = 0
+        self.repaired = 0
+        self.unparseable = 0
+        self.invalid = 0
+        self.parse_seconds = 0.0
+        self.validate_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, outcome, parse_seconds, validate_seconds=0.0):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.parse_seconds += parse_seconds
+            self.validate_seconds += validate_seconds
+
+    def to_dict(self):
+        with self._lock:
+            total = self.strict + self.repaired + self.unparseable + self.invalid
+            return {
+                'responses': total,
+                'strict': self.strict,
+                'repaired': self.repaired,
+                'unparseable': self.unparseable,
+                'invalid': self.invalid,
+                'avg_parse_ms': round(self.parse_seconds * 1000 / total, 3) if total else None,
+                'avg_validate_ms': round(self.validate_seconds * 1000 / total, 3) if total else None
+            }
+
+
+output_stats = OutputStats()
+
+
+def parse_structured(text, output_format, stats=output_stats):
+    """
+    Parse and validate a model response for output_format; returns a plain dict.
+    Raises json.JSONDecodeError if the text cannot be repaired into JSON or
+    does not match the schema, so callers keep a single failure path.
+    """
+    start = time.perf_counter()
+    outcome = 'strict'
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        repaired = repair_json(text or '')
+        try:
+            if repaired is None:
+                raise json.JSONDecodeError("No JSON object in response", text or '', 0)
+            data = json.loads(repaired)
+        except json.JSONDecodeError:
+            stats.record('unparseable', time.perf_counter() - start)
+            raise
+        outcome = 'repaired'
+    parsed = time.perf_counter()
+
+    try:
+        result = output_format.model.model_validate(data).model_dump()
+    except ValidationError as e:
+        stats.record('invalid', parsed - start, time.perf_counter() - parsed)
+        raise json.JSONDecodeError(
+            f"Response does not match the {output_format.name} schema: {e.error_count()} error(s)",
+            text, 0) from e
+    stats.record(outcome, parsed - start, time.perf_counter() - parsed)
+    if outcome == 'repaired':
+        logger.info(f"🔧 Repaired near-valid {output_format.name} JSON")
+    return result
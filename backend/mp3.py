@@ -0,0 +1,74 @@
+"""
+Helpers for joining MP3 clips without re-encoding.
+
+MP3 is a sequence of self-contained frames, so clips with the same encoding
+settings can be played back to back by concatenating their frames. Only the
+ID3 tags around each clip, and the Xing/Info (or VBRI) header frame that
+describes the length of that one clip, need to be removed.
+"""
+
+# Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+def strip_tags(data):
+    """Remove a leading ID3v2 tag and a trailing ID3v1 tag from MP3 bytes"""
+    if len(data) >= 10 and data[:3] == b'ID3':
+        # ID3v2 size is a 28-bit "syncsafe" integer (7 bits per byte)
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        header = 10 + size
+        if data[5] & 0x10:  # footer present
+            header += 10
+        data = data[header:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+
+def strip_info_frame(data):
+    """
+    Remove a leading Xing/Info or VBRI frame from Layer III MP3 bytes. It holds
+    no audio, only the frame count of its own clip, so players that trust it
+    would stop (or seek wrongly) after the first clip of a joined file.
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return data
+    version = (data[1] >> 3) & 0x03
+    layer = (data[1] >> 1) & 0x03
+    bitrate_index = data[2] >> 4
+    rate_index = (data[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return data  # reserved values, free format or not Layer III
+    mpeg1 = version == 3
+    bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (data[2] >> 1) & 0x01
+    frame_length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+    mono = (data[3] >> 6) == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info') or data[36:40] == b'VBRI':
+        return data[frame_length:]
+    return data
+
+
+def read_frames(path):
+    """Read an MP3 file and return its audio frames without tags or header frame"""
+    with open(path, 'rb') as clip:
+        return strip_info_frame(strip_tags(clip.read()))
+
+
+def join_clips(paths):
+    """Yield the frames of each clip in order (a generator, suitable for streaming)"""
+    for path in paths:
+        yield read_frames(path)
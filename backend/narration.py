@@ -0,0 +1,305 @@
+"""
+Content-addressed narration audio store.
+
+Narration files are named after a hash of everything that affects the audio
+(text, voice, model, output format), so the same narration is synthesized
+once and replayed from disk, and two places that share a name in different
+cities no longer overwrite each other. Files are written to a temporary
+name and renamed into place so readers never see a partial MP3.
+
+With sentence splitting enabled, a narration is synthesized one sentence at
+a time on a small pool bounded by the ElevenLabs concurrency limit. Each
+sentence is cached under its own hash and the clips are joined frame by
+frame (no re-encoding), so an edited description only re-synthesizes the
+sentences that changed and the first sentence can play before the rest exist.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mp3
+from audio_store import PARTIAL_SUFFIX
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{64}\.mp3$')
+SENTENCE_END_RE = re.compile(r'(?<=[.!?。！？])\s+')
+
+
+def split_sentences(text, min_chars=40):
+    """Split text into sentences, merging very short ones into the next"""
+    sentences = []
+    for part in SENTENCE_END_RE.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        if sentences and len(sentences[-1]) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {part}"
+        else:
+            sentences.append(part)
+    return sentences
+
+
+class NarrationStore:
+    """Synthesize narrations with ElevenLabs and keep them in an AudioStore"""
+
+    def __init__(self, store, api_key, voice_id, model_id, output_format,
+                 max_concurrency=3, split_sentences=True, max_retries=3, client_factory=None,
+                 clip_flight=None):
+        self.store = store
+        self.audio_folder = store.folder
+        self.api_key = api_key
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Optional callable returning the shared client (e.g. from a provider registry)
+        self.client_factory = client_factory
+        # Narrations currently being streamed: key -> Event set when finished
+        self._in_progress = {}
+        self._progress_lock = threading.Lock()
+        # Concurrent ElevenLabs requests are limited to max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='tts')
+        self.split_sentences = split_sentences
+        self.max_retries = max_retries
+        # Sentence clips being synthesized, keyed by their hash, so a stream and a
+        # pre-synthesis that share a sentence make one ElevenLabs request for it
+        self.clip_flight = clip_flight or SingleFlight('audio_clip')
+
+    def get_client(self):
+        """Return the shared ElevenLabs client, creating it on first use"""
+        if self.client_factory is not None:
+            return self.client_factory()
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from elevenlabs.client import ElevenLabs
+                    self._client = ElevenLabs(api_key=self.api_key)
+        return self._client
+
+    def key(self, text):
+        """Content hash identifying a narration"""
+        raw = '\x1f'.join([text, self.voice_id, self.model_id, self.output_format])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def filename(self, text):
+        return f"{self.key(text)}.mp3"
+
+    def path(self, filename):
+        return os.path.join(self.audio_folder, filename)
+
+    def lookup(self, text):
+        """Return the cached filename for text, or None"""
+        filename = self.filename(text)
+        if self.store.contains(filename):
+            return filename
+        return None
+
+    def convert(self, text):
+        """Start an ElevenLabs synthesis and return its chunk iterator"""
+        return self.get_client().text_to_speech.convert(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        )
+
+    def convert_stream(self, text):
+        """Start a streaming synthesis (falls back to convert on older SDKs)"""
+        tts = self.get_client().text_to_speech
+        if hasattr(tts, 'stream'):
+            return tts.stream(
+                text=text,
+                voice_id=self.voice_id,
+                model_id=self.model_id,
+                output_format=self.output_format,
+            )
+        return self.convert(text)
+
+    def _with_retries(self, fn):
+        """Run fn under a concurrency slot, backing off on HTTP 429 rate limits"""
+        for attempt in range(self.max_retries):
+            try:
+                with self._slots:
+                    return fn()
+            except Exception as e:
+                status = getattr(e, 'status_code', None) or getattr(getattr(e, 'response', None), 'status_code', None)
+                if status != 429 or attempt == self.max_retries - 1:
+                    raise
+                delay = (2 ** attempt) + random.random()
+                logger.warning(f"ElevenLabs rate limited, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def synthesize_clip(self, text):
+        """Synthesize text as a single clip (cached by its own hash) and return its path"""
+        filename = self.lookup(text)
+        if not filename:
+            filename = self.clip_flight.do(self.key(text), lambda: self.lookup(text) or self._with_retries(
+                lambda: self.write_atomic(self.filename(text), self.convert(text))))
+        return self.path(filename)
+
+    def sentences(self, text):
+        """Sentences to synthesize separately, or [text] when splitting is off"""
+        if not self.split_sentences:
+            return [text]
+        return split_sentences(text) or [text]
+
+    def open_stream(self, text):
+        """
+        Start synthesizing text and return a generator of MP3 chunks that also
+        writes them to the cache file. The first chunk is fetched eagerly so
+        upstream errors are raised here, before any response is sent.
+        Returns None if the same narration is already being streamed; use
+        wait_for_stream() and serve the finished file instead.
+        """
+        key = self.key(text)
+        with self._progress_lock:
+            if key in self._in_progress:
+                return None
+            done = threading.Event()
+            self._in_progress[key] = done
+
+        if len(self.sentences(text)) > 1:
+            tee = self._sentence_tee(text, key, done)
+        else:
+            tee = self._tee(text, key, done)
+        try:
+            # Priming also guarantees the tee's cleanup runs once it is closed or collected
+            first = next(tee)
+        except StopIteration:
+            return iter(())
+        return self._chain(first, tee)
+
+    @staticmethod
+    def _chain(first, rest):
+        try:
+            yield first
+            yield from rest
+        finally:
+            rest.close()
+
+    def _tee(self, text, key, done):
+        filename = f"{key}.mp3"
+        tmp_path = None
+        completed = False
+        self._slots.acquire()
+        try:
+            chunks = iter(self.convert_stream(text))
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{filename}.", suffix=PARTIAL_SUFFIX, dir=self.audio_folder)
+            with os.fdopen(fd, 'wb') as audio_file:
+                try:
+                    for chunk in chunks:
+                        audio_file.write(chunk)
+                        yield chunk
+                except GeneratorExit:
+                    # Client went away; the synthesis is already paid for, so finish the file
+                    for chunk in chunks:
+                        audio_file.write(chunk)
+            os.replace(tmp_path, self.path(filename))
+            completed = True
+            self.store.add(filename)
+        finally:
+            self._slots.release()
+            if not completed and tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            self._finish_stream(key, done)
+
+    def _sentence_tee(self, text, key, done):
+        """Yield each sentence clip as soon as it (and those before it) is ready"""
+        filename = f"{key}.mp3"
+        tmp_path = None
+        completed = False
+        futures = [self._pool.submit(self.synthesize_clip, sentence)
+                   for sentence in self.sentences(text)]
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{filename}.", suffix=PARTIAL_SUFFIX, dir=self.audio_folder)
+            with os.fdopen(fd, 'wb') as audio_file:
+                for future in futures:
+                    frames = mp3.read_frames(future.result())
+                    audio_file.write(frames)
+                    try:
+                        yield frames
+                    except GeneratorExit:
+                        # Client went away; finish the joined file from the clips being synthesized
+                        for rest in futures[futures.index(future) + 1:]:
+                            audio_file.write(mp3.read_frames(rest.result()))
+                        break
+            os.replace(tmp_path, self.path(filename))
+            completed = True
+            self.store.add(filename)
+        finally:
+            if not completed and tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            self._finish_stream(key, done)
+
+    def _finish_stream(self, key, done):
+        with self._progress_lock:
+            self._in_progress.pop(key, None)
+        done.set()
+
+    def wait_for_stream(self, text, timeout=60):
+        """Wait for an in-progress stream of text to finish; return its filename or None"""
+        with self._progress_lock:
+            done = self._in_progress.get(self.key(text))
+        if done is not None:
+            done.wait(timeout)
+        return self.lookup(text)
+
+    def write_atomic(self, filename, chunks):
+        """Write chunks to a temp file and rename it to filename"""
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{filename}.", suffix=PARTIAL_SUFFIX, dir=self.audio_folder)
+        try:
+            with os.fdopen(fd, 'wb') as audio_file:
+                for chunk in chunks:
+                    audio_file.write(chunk)
+            os.replace(tmp_path, self.path(filename))
+            self.store.add(filename)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return filename
+
+    def synthesize(self, text):
+        """
+        Return (filename, cache_hit). Cached narrations are returned without
+        calling ElevenLabs.
+        """
+        filename = self.lookup(text)
+        if filename:
+            return filename, True
+        with self._progress_lock:
+            streaming = self.key(text) in self._in_progress
+        if streaming:
+            # A client is already streaming this narration into the cache
+            filename = self.wait_for_stream(text)
+            if filename:
+                return filename, True
+        filename = self.filename(text)
+
+        sentences = self.sentences(text)
+        if len(sentences) == 1:
+            self._with_retries(lambda: self.write_atomic(filename, self.convert(text)))
+            return filename, False
+
+        # Synthesize (or reuse) every sentence in parallel, then join the frames
+        clip_paths = list(self._pool.map(self.synthesize_clip, sentences))
+        self.write_atomic(filename, mp3.join_clips(clip_paths))
+        return filename, False
+
+    @staticmethod
+    def is_hashed_name(filename):
+        return bool(HASHED_NAME_RE.match(filename))
@@ -0,0 +1,112 @@
+"""
+Background pre-synthesis of narrations for a freshly generated itinerary.
+
+After an itinerary is returned, its places are queued here so their
+narrations are already in the narration cache when the user presses Play.
+A small worker pool keeps us within ElevenLabs' concurrency limit, jobs run
+in schedule order (the first places of every queued itinerary go first),
+and a new itinerary from the same client cancels that client's queued jobs.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class NarrationPrefetcher:
+    """
+    synthesize: callable(text) that puts a narration into the cache
+    is_cached: callable(text) -> bool, used to skip work already done
+    """
+
+    def __init__(self, synthesize, is_cached, workers=2):
+        self.synthesize = synthesize
+        self.is_cached = is_cached
+        self.workers = workers
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        # client_id -> its latest batch, batch -> jobs not yet taken by a worker;
+        # both entries are dropped once a batch's last job is done
+        self._batches = {}
+        self._remaining = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.queued = 0
+        self.completed = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f'narration-prefetch-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, client_id, texts):
+        """
+        Queue texts (in schedule order) for client_id, cancelling any jobs
+        still queued from that client's previous itinerary.
+        """
+        if not texts:
+            return 0
+        self._ensure_workers()
+        batch = next(self._seq)
+        with self._lock:
+            self._batches[client_id] = batch
+            self._remaining[batch] = len(texts)
+            self.queued += len(texts)
+        for index, text in enumerate(texts):
+            # Position in the schedule first, then submission order
+            self._queue.put((index, batch, client_id, text))
+        return len(texts)
+
+    def _work(self):
+        while True:
+            index, batch, client_id, text = self._queue.get()
+            try:
+                with self._lock:
+                    if self._batches.get(client_id) != batch:
+                        self.cancelled += 1
+                        continue
+                if self.is_cached(text):
+                    with self._lock:
+                        self.skipped += 1
+                    continue
+                self.synthesize(text)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.warning(f"Narration pre-synthesis failed: {e}")
+                with self._lock:
+                    self.failed += 1
+            finally:
+                self._finish(client_id, batch)
+                self._queue.task_done()
+
+    def _finish(self, client_id, batch):
+        with self._lock:
+            self._remaining[batch] -= 1
+            if self._remaining[batch] == 0:
+                del self._remaining[batch]
+                if self._batches.get(client_id) == batch:
+                    del self._batches[client_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._queue.qsize(),
+                'queued': self.queued,
+                'completed': self.completed,
+                'skipped': self.skipped,
+                'cancelled': self.cancelled,
+                'failed': self.failed
+            }
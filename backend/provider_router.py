@@ -0,0 +1,259 @@
+"""
+Latency-aware router across the configured AI providers.
+
+Each provider is a callable taking a prompt (plus optional keyword options
+such as a response schema) and returning the response text.
+The router keeps an EWMA of latency and error rate per provider, sends each
+request to the fastest healthy one and, if it has not answered within the
+hedge delay, fires a backup request at the next provider and returns
+whichever valid answer arrives first.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """Rolling latency / error statistics for one provider"""
+
+    def __init__(self, alpha=0.3, window=50):
+        self.alpha = alpha
+        self.ewma_latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.samples = deque(maxlen=window)
+
+    def record_success(self, latency):
+        self.calls += 1
+        self.samples.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+
+    def record_failure(self, cooldown_after, cooldown_seconds):
+        self.calls += 1
+        self.failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= cooldown_after:
+            self.cooldown_until = time.time() + cooldown_seconds
+
+    def p95(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self):
+        return {
+            'ewma_latency': round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            'p95_latency': round(self.p95(), 3) if self.samples else None,
+            'error_rate': round(self.error_rate, 3),
+            'calls': self.calls,
+            'failures': self.failures,
+            'cooling_down': self.cooldown_until > time.time()
+        }
+
+
+class ProviderRouter:
+    """
+    Route prompts to the fastest healthy provider with optional hedging.
+
+    providers: ordered dict-like of name -> callable(prompt) -> str. The order
+    is the static preference used until latency samples exist.
+    hedge_delay: seconds before firing a backup request; None derives it
+    from the primary's p95 latency (falling back to default_hedge_delay).
+    """
+
+    def __init__(self, providers, hedge_enabled=True, hedge_delay=None,
+                 default_hedge_delay=8.0, cooldown_after=3, cooldown_seconds=30,
+                 max_workers=16):
+        self.providers = dict(providers)
+        self.order = list(self.providers)
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay = hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.cooldown_after = cooldown_after
+        self.cooldown_seconds = cooldown_seconds
+        self.stats = {name: ProviderStats() for name in self.providers}
+        # Streams are measured by time to first chunk; kept apart so those much
+        # shorter samples do not lower the p95 that sets the hedge delay of call()
+        self.stream_stats = {name: ProviderStats() for name in self.providers}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-router')
+
+    def ranked(self, streaming=False):
+        """
+        Providers ordered best-first; cooling-down providers go last.
+        streaming ranks by time to first chunk instead of full response time.
+        """
+        now = time.time()
+        with self._lock:
+            table = self.stream_stats if streaming else self.stats
+            measured = sorted(stats.ewma_latency for stats in table.values()
+                              if stats.ewma_latency is not None)
+            # Unmeasured providers are assumed to be as fast as the median
+            # measured one, so they neither jump ahead of a healthy measured
+            # provider nor starve; ties keep the static priority
+            typical = measured[len(measured) // 2] if measured else 0.0
+
+            def score(name):
+                stats = table[name]
+                cooling = max(self.stats[name].cooldown_until,
+                              self.stream_stats[name].cooldown_until) > now
+                latency = stats.ewma_latency if stats.ewma_latency is not None else typical
+                # Errors add a penalty so a provider that only ever failed is not ranked first
+                penalty = latency * 4 * stats.error_rate + self.default_hedge_delay * stats.error_rate
+                return (cooling, latency + penalty, self.order.index(name))
+            return sorted(self.providers, key=score)
+
+    def best(self):
+        ranked = self.ranked()
+        return ranked[0] if ranked else None
+
+    def _hedge_delay_for(self, name):
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        with self._lock:
+            p95 = self.stats[name].p95()
+        if p95 is None or len(self.stats[name].samples) < 5:
+            return self.default_hedge_delay
+        return max(1.0, p95)
+
+    def _run(self, name, prompt, validate, parse, options):
+        start = time.time()
+        try:
+            text = self.providers[name](prompt, **options)
+            if validate:
+                validate(text)
+            if parse:
+                text = parse(text)
+        except Exception:
+            with self._lock:
+                self.stats[name].record_failure(self.cooldown_after, self.cooldown_seconds)
+            raise
+        with self._lock:
+            self.stats[name].record_success(time.time() - start)
+        return text
+
+    def call(self, prompt, validate=None, parse=None, options=None):
+        """
+        Return the first valid response text. `validate` is called with the
+        text and should raise if the response is unusable (e.g. bad JSON);
+        such responses count as provider errors and the next provider is tried.
+        `parse` works the same way but its result is returned instead of the
+        text. `options` are keyword arguments for every provider callable.
+        """
+        options = options or {}
+        candidates = self.ranked()
+        if not candidates:
+            raise Exception("No AI service configured")
+
+        in_flight = {}
+        last_error = None
+
+        def launch():
+            name = candidates.pop(0)
+            in_flight[self._executor.submit(self._run, name, prompt, validate, parse, options)] = name
+            return name
+
+        primary = launch()
+        hedge_at = time.time() + self._hedge_delay_for(primary)
+
+        while in_flight:
+            timeout = None
+            if self.hedge_enabled and candidates:
+                timeout = max(0.0, hedge_at - time.time())
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Primary is slower than its usual p95: fire a backup request
+                backup = launch()
+                with self._lock:
+                    self.hedges_fired += 1
+                logger.info(f"⏱️ {primary} is slow, hedging with {backup}")
+                hedge_at = time.time() + self._hedge_delay_for(backup)
+                continue
+
+            for future in done:
+                name = in_flight.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"AI provider {name} failed: {e}")
+                    continue
+                if name != primary:
+                    with self._lock:
+                        self.hedges_won += 1
+                return text
+
+            # Every in-flight request failed: move on to the next provider now
+            if not in_flight and candidates:
+                primary = launch()
+                hedge_at = time.time() + self._hedge_delay_for(primary)
+
+        raise last_error or Exception("All AI providers failed")
+
+    def stream(self, streamers, prompt, options=None):
+        """
+        Yield text chunks from the best provider that has a streamer. The
+        time to the first chunk is recorded in the provider's streaming stats
+        (not in those call() hedges on); a provider that fails before its
+        first chunk is recorded as an error and the next-ranked one is tried. Failures after the first chunk are
+        recorded and re-raised, since the chunks already went to the caller.
+        """
+        options = options or {}
+        candidates = [name for name in self.ranked(streaming=True) if name in streamers]
+        if not candidates:
+            raise Exception("No AI service configured")
+
+        last_error = None
+        for name in candidates:
+            start = time.time()
+            try:
+                chunks = iter(streamers[name](prompt, **options))
+                first = next(chunks)
+            except Exception as e:
+                if isinstance(e, StopIteration):
+                    e = Exception(f"{name} returned an empty stream")
+                with self._lock:
+                    self.stream_stats[name].record_failure(self.cooldown_after, self.cooldown_seconds)
+                last_error = e
+                logger.warning(f"AI provider {name} failed before streaming: {e}")
+                continue
+
+            with self._lock:
+                self.stream_stats[name].record_success(time.time() - start)
+            yield first
+            try:
+                yield from chunks
+            except Exception:
+                with self._lock:
+                    self.stream_stats[name].record_failure(self.cooldown_after, self.cooldown_seconds)
+                raise
+            return
+
+        raise last_error or Exception("All AI providers failed")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'providers': {name: stats.to_dict() for name, stats in self.stats.items()},
+                'streaming': {name: stats.to_dict() for name, stats in self.stream_stats.items()},
+                'hedges_fired': self.hedges_fired,
+                'hedges_won': self.hedges_won
+            }
@@ -0,0 +1,95 @@
+"""
+Registry of lazily created provider clients and heavy optional modules.
+
+The Gemini, Cerebras and ElevenLabs SDKs and speech_recognition pull in large
+dependency trees, so nothing is imported until a request actually needs it.
+Whether a provider is configured is known from its API key alone, so
+/api/health can report it without importing anything.
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import types
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderNotConfigured(Exception):
+    """Raised when a provider is used without its API key / configuration"""
+
+
+def module_available(name):
+    """True if a module could be imported, checked without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class ProviderRegistry:
+    """
+    Usage:
+        registry.register('gemini', lambda: genai().Client(...), configured=bool(key))
+        client = registry.get('gemini')  # created on first use, then shared
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._configured = {}
+        self._instances = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, configured=True):
+        self._factories[name] = factory
+        self._configured[name] = configured
+
+    def configured(self, name):
+        return self._configured.get(name, False)
+
+    def loaded(self, name):
+        return name in self._instances
+
+    def get(self, name):
+        """Return the shared instance for name, creating it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if not self._configured.get(name):
+            raise ProviderNotConfigured(f"{name} is not configured")
+        with self._lock:
+            if name not in self._instances:
+                try:
+                    self._instances[name] = self._factories[name]()
+                    self._errors.pop(name, None)
+                    logger.info(f"✅ {name} initialized")
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+            return self._instances[name]
+
+    def module(self, module_name):
+        """Import an optional module on first use (registered under its own name)"""
+        if module_name not in self._factories:
+            self.register(module_name, lambda: importlib.import_module(module_name))
+        return self.get(module_name)
+
+    def reset(self):
+        """Drop client instances (after a fork, clients must not share sockets with the parent)"""
+        with self._lock:
+            self._instances = {
+                name: instance for name, instance in self._instances.items()
+                if isinstance(instance, types.ModuleType)
+            }
+
+    def status(self):
+        return {
+            name: {
+                'configured': self._configured[name],
+                'loaded': name in self._instances,
+                'error': self._errors.get(name)
+            }
+            for name in self._factories
+        }
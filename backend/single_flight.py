@@ -0,0 +1,235 @@
+"""
+Single-flight coalescing of identical in-flight upstream calls.
+
+When several requests with the same key arrive while the first one is still
+waiting on the upstream API, only that first request (the leader) makes the
+call; the others wait and receive its result or its error.
+
+Within one process this uses threading primitives. When `db_path` is set, a
+SQLite table is used as a cross-process lock so gunicorn workers can share
+a single upstream call too (results must then be JSON-serializable, and
+a leader's error reaches followers in other processes as the first of
+`error_types` it is an instance of, else as SingleFlightError).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightError(Exception):
+    """Error raised in a follower process when the leader's call failed"""
+
+
+def _rebuild_error(error_type, message):
+    if error_type is None:
+        return SingleFlightError(message)
+    if issubclass(error_type, json.JSONDecodeError):
+        return error_type(message, '', 0)
+    try:
+        return error_type(message)
+    except TypeError:
+        return SingleFlightError(message)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Usage: group.do(key, fn) -> fn() result, shared by concurrent callers.
+    """
+
+    def __init__(self, name, db_path=None, timeout=120, poll_interval=0.1, result_ttl=10,
+                 error_types=()):
+        self.name = name
+        self.db_path = db_path
+        self.error_types = tuple(error_types)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                with self._connect() as conn:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS single_flight ('
+                        ' namespace TEXT NOT NULL,'
+                        ' key TEXT NOT NULL,'
+                        ' started_at REAL NOT NULL,'
+                        ' finished_at REAL,'
+                        ' result TEXT,'
+                        ' error TEXT,'
+                        ' PRIMARY KEY (namespace, key))'
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Disabling cross-process single-flight for '{name}': {e}")
+                self.db_path = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def do(self, key, fn):
+        """Run fn() once per key among concurrent callers and share the outcome"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.db_path:
+                call.result = self._do_shared(key, fn)
+            else:
+                with self._lock:
+                    self.leaders += 1
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key):
+        """True if a call for key is running here or (with db_path) in another process"""
+        with self._lock:
+            if key in self._calls:
+                return True
+        if not self.db_path:
+            return False
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT 1 FROM single_flight WHERE namespace = ? AND key = ?'
+                    ' AND finished_at IS NULL AND started_at >= ?',
+                    (self.name, key, time.time() - self.timeout)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight '{self.name}' could not check key: {e}")
+            return False
+        return row is not None
+
+    def _do_shared(self, key, fn):
+        """Coordinate with other processes through the SQLite table"""
+        deadline = time.time() + self.timeout
+        while True:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    'DELETE FROM single_flight WHERE namespace = ? AND ('
+                    ' (finished_at IS NOT NULL AND finished_at < ?) OR'
+                    ' (finished_at IS NULL AND started_at < ?))',
+                    (self.name, now - self.result_ttl, now - self.timeout))
+                acquired = conn.execute(
+                    'INSERT OR IGNORE INTO single_flight (namespace, key, started_at) VALUES (?, ?, ?)',
+                    (self.name, key, now)).rowcount == 1
+                row = None
+                if not acquired:
+                    row = conn.execute(
+                        'SELECT finished_at, result, error FROM single_flight WHERE namespace = ? AND key = ?',
+                        (self.name, key)).fetchone()
+
+            if acquired:
+                return self._lead(key, fn)
+
+            if row is not None and row[0] is not None:
+                # Another process finished this call moments ago
+                with self._lock:
+                    self.coalesced += 1
+                if row[2] is not None:
+                    raise self._load_error(row[2])
+                return json.loads(row[1])
+
+            if time.time() > deadline:
+                logger.warning(f"Single-flight '{self.name}' timed out waiting, calling upstream directly")
+                return fn()
+            time.sleep(self.poll_interval)
+
+    def _lead(self, key, fn):
+        with self._lock:
+            self.leaders += 1
+        result = None
+        error = None
+        try:
+            result = fn()
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'UPDATE single_flight SET finished_at = ?, result = ?, error = ? '
+                        'WHERE namespace = ? AND key = ?',
+                        (time.time(),
+                         json.dumps(result, ensure_ascii=False) if error is None else None,
+                         self._dump_error(error) if error is not None else None,
+                         self.name, key))
+            except (sqlite3.Error, TypeError) as e:
+                logger.warning(f"Single-flight '{self.name}' could not publish result: {e}")
+                self._release(key)
+
+    def _dump_error(self, error):
+        error_type = next((cls.__name__ for cls in self.error_types if isinstance(error, cls)), None)
+        message = error.msg if isinstance(error, json.JSONDecodeError) else str(error)
+        return json.dumps({'type': error_type, 'message': message}, ensure_ascii=False)
+
+    def _load_error(self, stored):
+        try:
+            error = json.loads(stored)
+            message = error['message']
+            error_type = next((cls for cls in self.error_types if cls.__name__ == error['type']), None)
+        except (ValueError, KeyError, TypeError):
+            return SingleFlightError(stored)
+        return _rebuild_error(error_type, message)
+
+    def _release(self, key):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'DELETE FROM single_flight WHERE namespace = ? AND key = ?',
+                    (self.name, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight '{self.name}' could not release lock: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'shared_across_processes': bool(self.db_path)
+            }
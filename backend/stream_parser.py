@@ -0,0 +1,131 @@
+"""
+Incremental JSON parser for streamed itinerary responses.
+
+The LLM streams the itinerary JSON token by token. Instead of waiting for the
+whole document, IncrementalItineraryParser scans each chunk as it arrives and
+reports every place and day object the moment its closing brace is seen.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalItineraryParser:
+    """
+    Feed raw text chunks with feed(); it returns the events completed by
+    that chunk as (event_name, payload) tuples:
+
+        ('place', {'day_index': 0, 'place_index': 1, 'place': {...}})
+        ('day',   {'day_index': 0, 'day': {...}})
+
+    Anything outside the root object (```json fences, stray prose) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.length = 0
+        self.days = []
+        # Each stack frame: [container_char, start_offset, key_in_parent, child_count]
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars = []
+        self._last_string = None
+        self._pending_key = None
+        self._done = False
+
+    @property
+    def done(self):
+        """True once the root object has been closed"""
+        return self._done
+
+    def text(self):
+        return ''.join(self.buffer)
+
+    def feed(self, chunk):
+        events = []
+        if not chunk:
+            return events
+        base = self.length
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+
+        for offset, ch in enumerate(chunk):
+            if self._done:
+                break
+            pos = base + offset
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = ''.join(self._string_chars)
+                    continue
+                self._string_chars.append(ch)
+                continue
+
+            if not self._stack:
+                # Skip everything before the root object
+                if ch == '{':
+                    self._stack.append(['{', pos, None, 0])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif ch == ':':
+                if self._last_string is not None:
+                    self._pending_key = json.loads(f'"{self._last_string}"')
+                self._last_string = None
+            elif ch in '{[':
+                parent = self._stack[-1]
+                if parent[0] == '{':
+                    key = self._pending_key
+                else:
+                    key = parent[3]
+                parent[3] += 1
+                self._stack.append([ch, pos, key, 0])
+                self._pending_key = None
+                self._last_string = None
+            elif ch in '}]':
+                frame = self._stack.pop()
+                self._pending_key = None
+                self._last_string = None
+                if not self._stack:
+                    self._done = True
+                elif ch == '}':
+                    event = self._classify(frame, pos)
+                    if event:
+                        events.append(event)
+            elif ch == ',':
+                self._pending_key = None
+                self._last_string = None
+
+        return events
+
+    def _slice(self, start, end):
+        # Only called when a place/day closes, so joining here stays cheap
+        text = ''.join(self.buffer)
+        self.buffer = [text]
+        return text[start:end]
+
+    def _classify(self, frame, end):
+        """Emit an event if the closed object is a place or a day"""
+        path = [f[2] for f in self._stack] + [frame[2]]
+        # root{ schedule[ i{ places[ j{
+        try:
+            if len(path) == 5 and path[1] == 'schedule' and path[3] == 'places':
+                place = json.loads(self._slice(frame[1], end + 1))
+                return 'place', {'day_index': path[2], 'place_index': path[4], 'place': place}
+            if len(path) == 3 and path[1] == 'schedule':
+                day = json.loads(self._slice(frame[1], end + 1))
+                self.days.append(day)
+                return 'day', {'day_index': path[2], 'day': day}
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed object: {e}")
+        return None
@@ -0,0 +1,150 @@
+"""
+Ticket information for attractions.
+
+Known attractions are looked up in the local catalog (attractions.py) first.
+Otherwise the keyword rules are compiled once into a single regex. One scan
+of the lowercased attraction name finds every keyword occurrence, and the
+highest-priority rule that matched decides the category and source.
+Matching is by substring, so "museum" also matches "museums".
+"""
+
+import re
+from urllib.parse import quote
+
+# (category, source, keywords), highest priority first
+TICKET_RULES = [
+    ('paid_attraction', 'TripAdvisor',
+     ['museum', 'palace', 'castle', 'tower', 'aquarium', 'zoo', 'theme park', 'gallery', 'exhibition']),
+    ('free_attraction', 'TripAdvisor',
+     ['park', 'square', 'beach', 'market', 'street', 'district', 'neighborhood']),
+    ('historical_site', 'General Search',
+     ['fortress']),
+]
+
+CITY_CODES = {
+    'tokyo': '298184',
+    'paris': '187147',
+    'london': '186338',
+    'new york': '60763',
+    'rome': '187791',
+    'barcelona': '187497',
+    'amsterdam': '188590',
+    'berlin': '187275',
+    'madrid': '187514',
+    'vienna': '190454'
+}
+
+
+def get_city_code(city):
+    """TripAdvisor geo code for a city, or None if unknown"""
+    return CITY_CODES.get(city.split(',')[0].strip().lower())
+
+
+def tripadvisor_url(attraction_name, city):
+    """TripAdvisor products page in a known city, else a TripAdvisor search"""
+    city_code = get_city_code(city)
+    if city_code:
+        return f'https://www.tripadvisor.com/Attraction_Products-g{city_code}-{attraction_name.replace(" ", "_")}.html'
+    return f'https://www.tripadvisor.com/Search?q={quote(f"{attraction_name} {city}")}'
+
+
+def catalog_ticket_info(attraction, city):
+    """Ticket information from a catalog entry"""
+    search_query = f"{attraction['name']} {city} tickets"
+    search_url = f'https://www.google.com/search?q={quote(search_query)}'
+    if attraction['requires_ticket']:
+        notes = 'Approximate adult price; check the official website before visiting'
+    else:
+        notes = 'This attraction is free to visit'
+    return {
+        'requires_ticket': attraction['requires_ticket'],
+        'ticket_price': attraction['price'] or (None if attraction['requires_ticket'] else 'Free'),
+        'booking_url': attraction['booking_url'] or (search_url if attraction['requires_ticket'] else None),
+        'source': 'Attraction catalog',
+        'notes': notes,
+        'matched_name': attraction['name']
+    }
+
+
+class KeywordClassifier:
+    """
+    Usage:
+        classifier = KeywordClassifier(TICKET_RULES)
+        classifier.classify('National Museum')  # -> ('paid_attraction', 'TripAdvisor')
+    """
+
+    def __init__(self, rules):
+        self._rules = {}
+        keywords = []
+        for priority, (category, source, words) in enumerate(rules):
+            for word in words:
+                word = word.lower()
+                if word not in self._rules:
+                    self._rules[word] = (priority, category, source)
+                    keywords.append(word)
+        # A lookahead matches at every position, so overlapping keywords are
+        # all found; at one position the higher-priority (then longer) keyword wins
+        keywords.sort(key=lambda word: (self._rules[word][0], -len(word)))
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(word) for word in keywords) + '))')
+
+    def classify(self, text):
+        """(category, source) of the highest-priority rule matching text, or None"""
+        best = None
+        for match in self._pattern.finditer(text.lower()):
+            rule = self._rules[match.group(1)]
+            if best is None or rule[0] < best[0]:
+                best = rule
+                if rule[0] == 0:
+                    break
+        return best[1:] if best else None
+
+
+ticket_classifier = KeywordClassifier(TICKET_RULES)
+
+
+def search_ticket_info(attraction_name, city, catalog=None):
+    """
+    Ticket information for an attraction: from the catalog entry it matches,
+    else from the rule its name matches
+    """
+    if catalog is not None:
+        attraction = catalog.lookup(attraction_name, city)
+        if attraction:
+            return catalog_ticket_info(attraction, city)
+
+    match = ticket_classifier.classify(attraction_name)
+    category, source = match if match else (None, None)
+
+    if category == 'paid_attraction':
+        return {
+            'requires_ticket': True,
+            'ticket_price': 'Varies (check official website)',
+            'booking_url': tripadvisor_url(attraction_name, city),
+            'source': source,
+            'notes': 'Tickets may be available online or at the venue'
+        }
+    if category == 'free_attraction':
+        return {
+            'requires_ticket': False,
+            'ticket_price': 'Free',
+            'booking_url': None,
+            'source': source,
+            'notes': 'This attraction is typically free to visit'
+        }
+    if category == 'historical_site':
+        return {
+            'requires_ticket': True,
+            'ticket_price': 'Typically $5-25',
+            'booking_url': f'https://www.google.com/search?q={quote(f"{attraction_name} {city} tickets")}',
+            'source': source,
+            'notes': 'Historical sites often require tickets. Audio guides may be extra.'
+        }
+
+    # Default response if no tickets found
+    return {
+        'requires_ticket': False,
+        'ticket_price': None,
+        'booking_url': None,
+        'source': 'No ticket information found',
+        'notes': 'This attraction may be free to visit or tickets may be available on-site'
+    }
@@ -0,0 +1,217 @@
+"""
+Pooled HTTP clients for the upstream APIs (Google Maps, OpenWeather, OpenRouter).
+
+Each upstream gets its own requests.Session, so connections are kept alive
+and reused from a bounded pool. Every request has a connect and a read timeout,
+so one stalled connection cannot pin a worker. Idempotent calls are retried a
+few times with jittered exponential backoff. A per-upstream circuit breaker
+fails fast while a vendor is down, then lets a single trial request through
+after `reset_timeout` seconds.
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without contacting the upstream while its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    closed: requests flow; `failure_threshold` consecutive failures open it.
+    open: requests fail fast until `reset_timeout` seconds have passed.
+    half_open: one trial request decides between closed and open again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may be sent now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"✅ Upstream '{self.name}' recovered, closing circuit")
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or (
+                    self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = time.time()
+                self.times_opened += 1
+                logger.warning(
+                    f"⚠️  Upstream '{self.name}' failing, circuit open for {self.reset_timeout}s")
+
+    def end_trial(self):
+        """Free the half-open trial slot however the trial request ended"""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
+
+
+class UpstreamClient:
+    """
+    Usage: client.get('/path', params=...) -> requests.Response (paths are
+    joined to base_url; absolute URLs are used as-is). Callers still call
+    raise_for_status() as with plain requests.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.3, max_backoff=5, pool_size=10,
+                 failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.pool_size = pool_size
+        self.session = self._new_session()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _new_session(self):
+        session = requests.Session()
+        # Retries are handled here (with jitter and breaker accounting), not by urllib3
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def reset(self):
+        """Replace the connection pool (after a fork, sockets must not be shared with the parent)"""
+        old, self.session = self.session, self._new_session()
+        old.close()
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        time.sleep(delay)
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request through the pooled session.
+        idempotent: defaults to the HTTP method's semantics; non-idempotent
+        calls are only retried when the connection could not be established.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.url(path)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Upstream '{self.name}' is unavailable (circuit open)")
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                with self._lock:
+                    self.failures += 1
+                # A connect timeout means nothing was sent, so any method may retry
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= self.retries:
+                    raise
+                logger.warning(f"Upstream '{self.name}' request failed ({e}), retrying")
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+                continue
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                    with self._lock:
+                        self.failures += 1
+                else:
+                    self.breaker.record_success()
+            finally:
+                # Anything else raised (e.g. in a response hook) must not leave
+                # the breaker stuck half-open with its trial slot taken
+                self.breaker.end_trial()
+
+            if idempotent and response.status_code in RETRY_STATUSES and attempt < self.retries:
+                logger.warning(f"Upstream '{self.name}' returned {response.status_code}, retrying")
+                self._sleep_before_retry(attempt, response)
+                response.close()
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+                continue
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'requests': self.requests,
+                'retried': self.retried,
+                'failures': self.failures,
+                'timeout': list(self.timeout)
+            }
+        counters['circuit'] = self.breaker.stats()
+        return counters
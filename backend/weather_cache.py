@@ -0,0 +1,116 @@
+"""
+Stale-while-revalidate cache for OpenWeather responses.
+
+Entries are keyed on the location (lat/lon snapped to a grid cell, or the
+normalized city name) and are fresh within the time bucket they were fetched
+in, matching OpenWeather's update cadence. After that an entry is still
+served for up to `stale_seconds` while a background refresh fetches the new
+bucket, so popular cities cost one upstream call per bucket at most.
+"""
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def weather_location_key(city, lat, lon, grid=0.1):
+    """Grid cell for coordinates (grid in degrees), else the normalized city name"""
+    if lat not in (None, '') and lon not in (None, ''):
+        cell_lat = math.floor(float(lat) / grid)
+        cell_lon = math.floor(float(lon) / grid)
+        return f"geo:{grid}:{cell_lat}:{cell_lon}"
+    return 'city:' + ' '.join(str(city).lower().split())
+
+
+class WeatherCache:
+    """
+    Usage: cache.get(key, fetch) -> fetch() result, cached per time bucket.
+    fetch must return a JSON-serializable value.
+    """
+
+    def __init__(self, name, bucket_seconds=1800, stale_seconds=6 * 3600,
+                 max_entries=1024, db_path=None, refresh_workers=2):
+        self.bucket_seconds = bucket_seconds
+        self.stale_seconds = stale_seconds
+        self._store = TTLCache(name, max_entries=max_entries,
+                               ttl=bucket_seconds + stale_seconds, db_path=db_path)
+        self._executor = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix=f'{name}-refresh')
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def get(self, key, fetch):
+        """Return cached data for key, fetching synchronously only on a miss"""
+        now = time.time()
+        entry = self._store.get(key)
+        if entry is not None:
+            fresh = self.bucket(entry['fetched_at']) == self.bucket(now)
+            if fresh or now - entry['fetched_at'] <= self.bucket_seconds + self.stale_seconds:
+                with self._lock:
+                    if fresh:
+                        self.fresh_hits += 1
+                    else:
+                        self.stale_hits += 1
+                if not fresh:
+                    self._refresh_in_background(key, fetch)
+                return entry['data']
+
+        with self._lock:
+            self.misses += 1
+        return self._fetch_and_store(key, fetch)
+
+    def _fetch_and_store(self, key, fetch):
+        data = fetch()
+        self._store.set(key, {'fetched_at': time.time(), 'data': data})
+        return data
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(key, fetch)
+                with self._lock:
+                    self.refreshes += 1
+            except Exception as e:
+                # Keep serving the stale entry; the next request tries again
+                logger.warning(f"Weather refresh failed for {key}: {e}")
+                with self._lock:
+                    self.refresh_errors += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'bucket_seconds': self.bucket_seconds,
+                'stale_seconds': self.stale_seconds,
+                'fresh_hits': self.fresh_hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'refreshing': len(self._refreshing)
+            }
+        counters['entries'] = self._store.stats()['entries']
+        return counters